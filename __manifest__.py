@@ -26,11 +26,13 @@
     'depends': [
         'base',
         'mail',
+        'bus',
         'web',
         'stock',
         'sale_stock',
         'sale_management',
         'account',
+        'phone_validation',
     ],
     'data': [
         # Seguridad (se carga primero)
@@ -39,13 +41,19 @@
         
         # Datos base
         'data/sequences.xml',
+        'data/ir_cron.xml',
+        'data/commission_rules.xml',
+        'data/mail_activity_types.xml',
         
         # Vistas (en orden lógico)
         'views/device_views.xml',
         'views/repair_problem_views.xml',
         'views/repair_order_views.xml',
+        'views/commission_rule_views.xml',
         'views/menus.xml',
         'views/repair_analytics_views.xml',
+        'views/repair_templates.xml',
+        'views/repair_metric_views.xml',
     ],
     'demo': [
         'demo/demo_data.xml',
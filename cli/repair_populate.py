@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import optparse
+import time
+
+import odoo
+from odoo import api, SUPERUSER_ID
+from odoo.cli import Command
+from odoo.modules.registry import Registry
+
+_logger = logging.getLogger(__name__)
+
+
+class RepairPopulate(Command):
+    """Genera datos sintéticos de reparaciones para pruebas de carga"""
+    name = 'repair_populate'
+
+    def run(self, cmdargs):
+        parser = odoo.tools.config.parser
+        parser.prog = f'{parser.prog.split()[0]} {self.name}'
+        group = optparse.OptionGroup(parser, "Generación de Datos de Reparaciones")
+        group.add_option('--orders', dest='repair_orders', type='int', default=1000,
+                         help="Número de órdenes de reparación a generar (por defecto 1000).")
+        group.add_option('--partners', dest='repair_partners', type='int',
+                         help="Número de clientes (por defecto una cuarta parte de las órdenes).")
+        group.add_option('--devices', dest='repair_devices', type='int',
+                         help="Número de dispositivos (por defecto la mitad de las órdenes).")
+        group.add_option('--brands', dest='repair_brands', type='int', default=10,
+                         help="Número de marcas (por defecto 10).")
+        group.add_option('--models-per-brand', dest='repair_models_per_brand', type='int', default=12,
+                         help="Modelos por marca (por defecto 12).")
+        group.add_option('--technicians', dest='repair_technicians', type='int', default=10,
+                         help="Número de técnicos (por defecto 10).")
+        group.add_option('--years', dest='repair_years', type='int', default=3,
+                         help="Años de histórico sobre los que repartir las órdenes (por defecto 3).")
+        group.add_option('--seed', dest='repair_seed', type='int', default=42,
+                         help="Semilla del generador; la misma semilla produce los mismos datos.")
+        group.add_option('--batch-size', dest='repair_batch_size', type='int', default=10000,
+                         help="Registros por bloque de inserción (por defecto 10000).")
+        parser.add_option_group(group)
+        opt = odoo.tools.config.parse_config(cmdargs)
+        dbname = odoo.tools.config['db_name']
+        if not dbname:
+            parser.error("Indique la base de datos con -d.")
+
+        registry = Registry(dbname)
+        start = time.perf_counter()
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            counts = env['mobile.repair.populate']._generate(
+                orders=opt.repair_orders,
+                partners=opt.repair_partners,
+                devices=opt.repair_devices,
+                brands=opt.repair_brands,
+                models_per_brand=opt.repair_models_per_brand,
+                technicians=opt.repair_technicians,
+                years=opt.repair_years,
+                seed=opt.repair_seed,
+                batch_size=opt.repair_batch_size,
+            )
+        _logger.info(
+            "Datos de carga generados en %.1f s: %s", time.perf_counter() - start,
+            ", ".join(f"{model}: {count}" for model, count in counts.items()),
+        )
@@ -1,3 +1,5 @@
 # -*- coding: utf-8 -*-
 
-from . import devices
\ No newline at end of file
+from . import devices
+from . import workbench
+from . import metrics
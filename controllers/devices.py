@@ -1,155 +1,98 @@
 # -*- coding: utf-8 -*-
 
+from markupsafe import escape
+
 from odoo import http
 from odoo.http import request
 
+from ..models.repair_metric import profiled
+
 class DeviceController(http.Controller):
     """Controlador para datos de dispositivos y clientes"""
 
     @http.route('/repair/customer/<int:customer_id>/stats', type='json', auth='user')
+    @profiled('route')
     def get_customer_stats(self, customer_id):
         """Obtiene estadísticas de reparaciones de un cliente específico"""
         try:
-            RepairOrder = request.env['mobile.repair.order']
-            
-            # Estadísticas básicas
-            total_repairs = RepairOrder.search_count([
-                ('customer_id', '=', customer_id)
-            ])
-            
-            completed_repairs = RepairOrder.search_count([
-                ('customer_id', '=', customer_id),
-                ('state', 'in', ['repaired', 'delivered'])
-            ])
-            
-            pending_repairs = RepairOrder.search_count([
-                ('customer_id', '=', customer_id),
-                ('state', 'in', ['draft', 'in_repair'])
-            ])
-            
-            # Últimas 5 reparaciones
-            recent_orders = RepairOrder.search([
-                ('customer_id', '=', customer_id)
-            ], order='date_received desc', limit=5)
-            
-            recent_repairs = []
-            for order in recent_orders:
-                recent_repairs.append({
-                    'id': order.id,
-                    'name': order.name,
-                    'device_info': order.device_info,
-                    'state': order.state,
-                    'state_label': dict(order._fields['state'].selection)[order.state],
-                    'date_received': order.date_received.strftime('%d/%m/%Y') if order.date_received else '',
-                    'problem_description': order.problem_description[:100] + '...' if len(order.problem_description) > 100 else order.problem_description
-                })
-            
-            return {
-                'total_repairs': total_repairs,
-                'completed_repairs': completed_repairs,
-                'pending_repairs': pending_repairs,
-                'recent_repairs': recent_repairs
-            }
-            
-        except Exception as e:
-            return {
-                'total_repairs': 0,
-                'completed_repairs': 0,
-                'pending_repairs': 0,
-                'recent_repairs': []
-            }
+            stats = request.env['mobile.repair.order']._get_customer_stats([customer_id])
+            return stats[customer_id]
+        except Exception:
+            return self._empty_customer_stats()
+
+    @http.route('/repair/customers/stats', type='json', auth='user')
+    @profiled('route')
+    def get_customers_stats(self, customer_ids):
+        """Obtiene las estadísticas de varios clientes en una sola petición"""
+        try:
+            customer_ids = [int(customer_id) for customer_id in customer_ids]
+            stats = request.env['mobile.repair.order']._get_customer_stats(customer_ids)
+            return {str(customer_id): customer_stats for customer_id, customer_stats in stats.items()}
+        except Exception:
+            return {str(customer_id): self._empty_customer_stats() for customer_id in customer_ids or []}
+
+    @staticmethod
+    def _empty_customer_stats():
+        return {
+            'total_repairs': 0,
+            'completed_repairs': 0,
+            'pending_repairs': 0,
+            'recent_repairs': []
+        }
 
     @http.route('/repair/customer/<int:customer_id>/recent_repairs', type='json', auth='user')
-    def get_recent_repairs_html(self, customer_id):
-        """Genera HTML para mostrar las reparaciones recientes"""
+    @profiled('route')
+    def get_recent_repairs_html(self, customer_id, etag=None):
+        """Genera HTML para mostrar las reparaciones recientes
+
+        El fragmento se sirve desde caché mientras las órdenes del cliente no
+        cambien. Si el cliente envía el ``etag`` recibido anteriormente y sigue
+        vigente, se responde sin HTML.
+        """
         try:
             RepairOrder = request.env['mobile.repair.order']
-            
-            recent_orders = RepairOrder.search([
-                ('customer_id', '=', customer_id)
-            ], order='date_received desc', limit=5)
-            
-            if not recent_orders:
-                return {
-                    'html': '''
-                        <div class="text-center text-muted py-4">
-                            <i class="fa fa-mobile fa-3x mb-3 opacity-25"></i>
-                            <p class="mb-0">No hay reparaciones registradas</p>
-                            <small>Las reparaciones aparecerán aquí cuando se registren</small>
-                        </div>
-                    '''
-                }
-            
-            html_parts = []
-            for order in recent_orders:
-                state_colors = {
-                    'draft': 'secondary',
-                    'in_repair': 'warning',
-                    'repaired': 'success',
-                    'delivered': 'primary',
-                    'cancelled': 'danger'
-                }
-                
-                state_icons = {
-                    'draft': '📥',
-                    'in_repair': '🔧',
-                    'repaired': '✅',
-                    'delivered': '📦',
-                    'cancelled': '❌'
-                }
-                
-                state_labels = {
-                    'draft': 'Recibida',
-                    'in_repair': 'En Reparación',
-                    'repaired': 'Lista',
-                    'delivered': 'Entregada',
-                    'cancelled': 'Cancelada'
-                }
-                
-                color = state_colors.get(order.state, 'secondary')
-                icon = state_icons.get(order.state, '📱')
-                label = state_labels.get(order.state, order.state)
-                
-                html_parts.append(f'''
-                    <div class="card mb-3 border-{color}">
-                        <div class="card-body">
-                            <div class="d-flex justify-content-between align-items-start">
-                                <div class="flex-grow-1">
-                                    <h6 class="card-title mb-1">
-                                        {icon} {order.name}
-                                        <span class="badge badge-{color} ms-2">{label}</span>
-                                    </h6>
-                                    <p class="card-text">
-                                        <strong>📱 {order.device_info}</strong><br/>
-                                        <small class="text-muted">
-                                            📅 {order.date_received.strftime('%d/%m/%Y %H:%M') if order.date_received else 'Sin fecha'}
-                                        </small>
-                                    </p>
-                                    <p class="card-text">
-                                        <small>{order.problem_description[:80]}{'...' if len(order.problem_description) > 80 else ''}</small>
-                                    </p>
-                                </div>
-                                <div class="text-end">
-                                    <button class="btn btn-outline-primary btn-sm" 
-                                            onclick="window.open('/web#id={order.id}&model=mobile.repair.order&view_type=form', '_blank')">
-                                        Ver Detalle
-                                    </button>
-                                </div>
-                            </div>
-                        </div>
-                    </div>
-                ''')
-            
+            stamp = RepairOrder._get_recent_repairs_stamp(customer_id)
+            current_etag = RepairOrder._get_recent_repairs_etag(customer_id, stamp)
+            request.future_response.headers['ETag'] = '"%s"' % current_etag
+
+            if etag == current_etag or request.httprequest.if_none_match.contains(current_etag):
+                return {'etag': current_etag, 'not_modified': True}
+
             return {
-                'html': ''.join(html_parts)
+                'html': RepairOrder._render_recent_repairs_html(customer_id, stamp),
+                'etag': current_etag,
             }
-            
+
         except Exception as e:
             return {
                 'html': f'''
                     <div class="alert alert-warning" role="alert">
                         <strong>Error:</strong> No se pudieron cargar las reparaciones.
-                        <br/><small>{str(e)}</small>
+                        <br/><small>{escape(str(e))}</small>
                     </div>
                 '''
-            }
\ No newline at end of file
+            }
+
+    @http.route('/repair/search', type='json', auth='user')
+    @profiled('route')
+    def search(self, term, limit=20):
+        """Búsqueda unificada de mostrador sobre órdenes, dispositivos y clientes"""
+        return {
+            'results': request.env['mobile.repair.search']._search_all(term, limit=min(int(limit), 100)),
+        }
+
+    @http.route('/repair/caller', type='json', auth='user')
+    @profiled('route')
+    def get_caller_card(self, number):
+        """Identifica al cliente de una llamada entrante por su número"""
+        return request.env['res.partner']._get_caller_card(number)
+
+    @http.route('/repair/orders/page', type='json', auth='user')
+    @profiled('route')
+    def get_orders_page(self, domain=None, cursor=None, limit=80):
+        """Página de órdenes por cursor
+
+        Se pide la primera página sin ``cursor`` y las siguientes con el
+        ``next_cursor`` recibido; ``next_cursor`` es falso en la última.
+        """
+        return request.env['mobile.repair.order']._search_keyset(domain=domain, cursor=cursor, limit=limit)
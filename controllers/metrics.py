@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+
+from odoo import http
+from odoo.http import request
+
+
+class MetricsController(http.Controller):
+    """Métricas de rendimiento del módulo"""
+
+    @http.route('/repair/metrics/top', type='json', auth='user')
+    def get_top_offenders(self, hours=24, limit=20, order='duration_total'):
+        """Devuelve los cálculos, acciones y rutas más costosos del periodo
+
+        Solo accesible para los responsables de reparaciones: el resto de
+        usuarios no tiene permiso de lectura sobre las métricas.
+        """
+        return request.env['mobile.repair.metric']._get_top_offenders(
+            hours=int(hours), limit=min(int(limit), 200), order=order,
+        )
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+
+from odoo import http
+from odoo.http import request
+
+
+class WorkbenchController(http.Controller):
+    """Banco de trabajo de técnicos"""
+
+    @http.route('/repair/workbench', type='json', auth='user')
+    def get_workbench(self):
+        """Devuelve la cola de órdenes abiertas del técnico actual
+
+        Los cambios posteriores llegan por el bus con el tipo de notificación
+        ``mobile_repair/workbench``.
+        """
+        return {
+            'orders': request.env['mobile.repair.order']._get_workbench_snapshot(),
+        }
@@ -2,4 +2,12 @@
 
 from . import repair_order
 from . import device
-from . import repair_problem
\ No newline at end of file
+from . import repair_problem
+from . import ir_sequence
+from . import commission_rule
+from . import repair_report
+from . import repair_audit
+from . import repair_search
+from . import repair_populate
+
+from . import repair_metric
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+
+from odoo import models, fields, api, tools
+
+
+class RepairCommissionRule(models.Model):
+    """Regla de comisión para técnicos.
+
+    Una regla puede limitarse a un técnico, a una categoría de problema o a
+    ambos, y establecer un volumen mensual mínimo del técnico a partir del
+    cual se aplica (comisiones por tramos).
+    """
+    _name = 'mobile.repair.commission.rule'
+    _description = 'Regla de Comisión de Reparación'
+    _order = 'sequence, technician_id, category_id, min_volume desc'
+
+    name = fields.Char(string='Nombre', required=True)
+    sequence = fields.Integer(string='Secuencia', default=10)
+    active = fields.Boolean(string='Activo', default=True)
+    technician_id = fields.Many2one(
+        'res.users', string='Técnico', ondelete='cascade',
+        help="Vacío para aplicar a todos los técnicos."
+    )
+    category_id = fields.Many2one(
+        'mobile.repair.problem.category', string='Categoría de Problema', ondelete='cascade',
+        help="Vacío para aplicar a todas las categorías."
+    )
+    min_volume = fields.Monetary(
+        string='Volumen Mensual Mínimo', currency_field='currency_id', default=0.0,
+        help="Facturación mensual del técnico a partir de la cual se aplica la regla."
+    )
+    rate = fields.Float(string='Comisión (%)', required=True, digits=(5, 2))
+    currency_id = fields.Many2one(
+        'res.currency', string='Moneda', default=lambda self: self.env.company.currency_id, readonly=True
+    )
+
+    _sql_constraints = [
+        ('positive_rate', 'CHECK(rate >= 0)', 'La comisión no puede ser negativa'),
+        ('positive_min_volume', 'CHECK(min_volume >= 0)', 'El volumen mínimo no puede ser negativo'),
+    ]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        rules = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return rules
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache()
+    def _get_commission_table(self):
+        """Compila las reglas activas en una tabla en memoria.
+
+        Devuelve ``{(technician_id, category_id): ((min_volume, rate), ...)}``
+        con ``0`` como comodín y los tramos ordenados de mayor a menor volumen.
+        """
+        table = defaultdict(list)
+        for rule in self.sudo().search([]):
+            key = (rule.technician_id.id or 0, rule.category_id.id or 0)
+            table[key].append((rule.min_volume, rule.rate / 100.0))
+        return {key: tuple(sorted(tiers, reverse=True)) for key, tiers in table.items()}
+
+    @api.model
+    def _get_commission_rate(self, table, technician_id, category_ids, volume=0.0):
+        """Tasa aplicable según la regla más específica que cubra el caso.
+
+        Se prueba primero técnico y categoría, después solo categoría, después
+        solo técnico y por último las reglas generales. Si varias categorías
+        del mismo nivel aplican, se toma la tasa más alta.
+        """
+        levels = (
+            [(technician_id, category_id) for category_id in category_ids],
+            [(0, category_id) for category_id in category_ids],
+            [(technician_id, 0)],
+            [(0, 0)],
+        )
+        for keys in levels:
+            rates = [
+                next((rate for min_volume, rate in table.get(key, ()) if volume >= min_volume), None)
+                for key in keys
+            ]
+            rates = [rate for rate in rates if rate is not None]
+            if rates:
+                return max(rates)
+        return 0.0
+
+    @api.model
+    def _has_volume_tiers(self, table):
+        return any(min_volume > 0 for tiers in table.values() for min_volume, rate in tiers)
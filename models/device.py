@@ -1,7 +1,19 @@
 # -*- coding: utf-8 -*-
 
+import logging
+from collections import Counter
+from itertools import zip_longest
+
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
+from odoo.tools import split_every
+from odoo.tools.sql import index_exists
+
+from .repair_metric import profiled
+from .repair_search import normalize_search_text
+
+_logger = logging.getLogger(__name__)
+
 
 class RepairDeviceBrand(models.Model):
     """Define una marca de dispositivo, como Apple o Samsung."""
@@ -21,6 +33,7 @@ class RepairDeviceBrand(models.Model):
     )
     
     @api.depends('model_ids')
+    @profiled('compute')
     def _compute_model_count(self):
         for brand in self:
             brand.model_count = len(brand.model_ids)
@@ -52,6 +65,7 @@ class RepairDeviceModel(models.Model):
     )
     
     @api.depends('brand_id.name', 'name')
+    @profiled('compute')
     def _compute_display_name(self):
         for model in self:
             if model.brand_id:
@@ -91,6 +105,7 @@ class RepairDeviceAccessory(models.Model):
     )
     
     @api.depends('accessory_type')
+    @profiled('compute')
     def _compute_color_code(self):
         """Asigna colores basados en el tipo de accesorio para una mejor UX."""
         color_map = {'tapa': '#6f42c1', 'sim': '#28a745', 'sd_card': '#fd7e14', 'sim_tray': '#17a2b8'}
@@ -141,15 +156,20 @@ class RepairDevice(models.Model):
     notes = fields.Text(string='Observaciones')
     
     display_name = fields.Char(string='Nombre del Dispositivo', compute='_compute_display_name', store=True, readonly=True)
+    search_text = fields.Char(
+        string='Texto de Búsqueda', compute='_compute_search_text', store=True, index='trigram',
+        help="Código, IMEI, marca, modelo y colores normalizados para la búsqueda de mostrador."
+    )
     
     # Relación con órdenes de reparación
-    repair_ids = fields.One2many('mobile.repair.order', 'device_id', string='Órdenes de Reparación')
+    repair_ids = fields.One2many('mobile.repair.order', 'device_id', string='Órdenes de Reparación', context={'active_test': False})
     
     # Estadísticas
     repair_count = fields.Integer(string='Reparaciones', compute='_compute_repair_stats', store=True, readonly=True)
     last_repair_date = fields.Datetime(string='Última Reparación', compute='_compute_repair_stats', store=True, readonly=True)
     
     @api.depends('brand_id.name', 'model_id.name', 'color_ids.name', 'device_code')
+    @profiled('compute')
     def _compute_display_name(self):
         for device in self:
             parts = [f"[{device.device_code}]"] if device.device_code else []
@@ -159,32 +179,138 @@ class RepairDevice(models.Model):
                 parts.append(", ".join(device.color_ids.mapped('name')))
             device.display_name = " - ".join(parts) if parts else "Dispositivo sin definir"
     
-    @api.depends('repair_ids')
+    @api.depends('display_name', 'imei')
+    @profiled('compute')
+    def _compute_search_text(self):
+        for device in self:
+            device.search_text = normalize_search_text(device.display_name, device.imei)
+
+    @api.depends('repair_ids', 'repair_ids.date_received')
+    @profiled('compute')
     def _compute_repair_stats(self):
-        """Calcula estadísticas de reparaciones de forma optimizada."""
+        """Calcula estadísticas de reparaciones con una consulta agrupada por lote."""
+        stats = {}
+        device_ids = [device_id for device_id in self.ids if device_id]
+        if device_ids:
+            repair_data = self.env['mobile.repair.order'].with_context(active_test=False).read_group(
+                [('device_id', 'in', device_ids)],
+                ['device_id', 'date_received:max'],
+                ['device_id']
+            )
+            stats = {
+                item['device_id'][0]: (item['device_id_count'], item['date_received'])
+                for item in repair_data
+            }
         for device in self:
-            device.repair_count = len(device.repair_ids)
-            if device.repair_ids:
-                device.last_repair_date = max(device.repair_ids.mapped('date_received'))
-            else:
-                device.last_repair_date = False
+            device.repair_count, device.last_repair_date = stats.get(device.id, (0, False))
+
+    @api.model
+    def _recompute_repair_stats(self, batch_size=1000):
+        """Recalcula las estadísticas de todos los dispositivos por bloques.
+
+        Pensado para ejecutarse tras una actualización o desde ``odoo-bin shell``:
+        ``env['mobile.repair.device']._recompute_repair_stats()``. Cada bloque
+        se calcula con una consulta agrupada, se escribe y se vacía de la caché
+        para mantener acotada la memoria.
+        """
+        self.env.cr.execute("SELECT id FROM mobile_repair_device ORDER BY id")
+        device_ids = [row[0] for row in self.env.cr.fetchall()]
+        stat_fields = ['repair_count', 'last_repair_date']
+        for batch_ids in split_every(batch_size, device_ids):
+            devices = self.browse(batch_ids)
+            for fname in stat_fields:
+                self.env.add_to_compute(self._fields[fname], devices)
+            devices.flush_recordset(stat_fields)
+            self.env.invalidate_all()
+        return len(device_ids)
     
     @api.model_create_multi
     def create(self, vals_list):
-        for vals in vals_list:
-            if 'device_code' not in vals or not vals['device_code']:
-                vals['device_code'] = self.env['ir.sequence'].next_by_code('mobile.repair.device') or 'Nuevo'
+        # Un único bloque de códigos para todos los dispositivos del lote
+        pending = [vals for vals in vals_list if not vals.get('device_code')]
+        codes = self.env['ir.sequence'].next_block_by_code('mobile.repair.device', len(pending)) if pending else []
+        for vals, code in zip_longest(pending, codes, fillvalue='Nuevo'):
+            vals['device_code'] = code
         return super().create(vals_list)
     
+    def init(self):
+        # La unicidad del IMEI la garantiza la base de datos, incluso entre
+        # recepciones concurrentes; los dispositivos sin IMEI no participan.
+        # Si ya hay duplicados (de antes del índice) no se crea y se avisa de
+        # cuáles son, en lugar de interrumpir la actualización del módulo.
+        if index_exists(self.env.cr, 'mobile_repair_device_imei_uniq'):
+            return
+        self.env.cr.execute("""
+            SELECT imei, array_agg(id ORDER BY id)
+              FROM mobile_repair_device
+             WHERE imei IS NOT NULL AND imei != ''
+          GROUP BY imei
+            HAVING COUNT(*) > 1
+        """)
+        duplicates = self.env.cr.fetchall()
+        if duplicates:
+            _logger.warning(
+                "No se ha creado el índice único de IMEI porque hay dispositivos con el mismo IMEI. "
+                "Corríjalos y actualice de nuevo el módulo. IMEI e ids de dispositivo:\n%s",
+                "\n".join(f"{imei}: {', '.join(map(str, device_ids))}" for imei, device_ids in duplicates),
+            )
+            return
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX mobile_repair_device_imei_uniq
+                ON mobile_repair_device (imei)
+             WHERE imei IS NOT NULL AND imei != ''
+        """)
+
+    @staticmethod
+    def _is_valid_imei(imei):
+        """Comprueba el formato de un IMEI: 15 dígitos con dígito de control Luhn."""
+        if not imei.isdigit() or len(imei) != 15:
+            return False
+        total = 0
+        for position, digit in enumerate(int(char) for char in reversed(imei)):
+            if position % 2:
+                digit *= 2
+                if digit > 9:
+                    digit -= 9
+            total += digit
+        return total % 10 == 0
+
     @api.constrains('imei')
     def _check_imei_unique(self):
-        for device in self:
-            if device.imei:
-                if not device.imei.isdigit() or len(device.imei) != 15:
-                    raise ValidationError("El IMEI debe contener exactamente 15 dígitos numéricos.")
-                if self.search_count([('imei', '=', device.imei), ('id', '!=', device.id)]) > 0:
-                    raise ValidationError(f"Ya existe un dispositivo con IMEI {device.imei}")
+        """Valida formato y unicidad de los IMEI de todo el lote a la vez.
+
+        Se informa de todos los IMEI incorrectos en un único error, para que
+        una importación no se detenga en el primero.
+        """
+        devices = self.filtered('imei')
+        if not devices:
+            return
+
+        invalid = sorted({device.imei for device in devices if not self._is_valid_imei(device.imei)})
+        batch_counts = Counter(devices.mapped('imei'))
+        in_batch = sorted(imei for imei, count in batch_counts.items() if count > 1)
+        existing = self.search_read(
+            [('imei', 'in', list(batch_counts)), ('id', 'not in', devices.ids)], ['imei']
+        )
+        duplicated = sorted({record['imei'] for record in existing})
+
+        errors = []
+        if invalid:
+            errors.append("IMEI inválidos (deben tener 15 dígitos y un dígito de control correcto): %s" % ", ".join(invalid))
+        if in_batch:
+            errors.append("IMEI repetidos en los datos introducidos: %s" % ", ".join(in_batch))
+        if duplicated:
+            errors.append("Ya existen dispositivos con estos IMEI: %s" % ", ".join(duplicated))
+        if errors:
+            raise ValidationError("\n".join(errors))
     
+    def write(self, vals):
+        res = super().write(vals)
+        if 'brand_id' in vals or 'model_id' in vals:
+            orders = self.env['mobile.repair.order'].sudo().with_context(active_test=False).search([('device_id', 'in', self.ids)])
+            self.env['mobile.repair.report.problem']._queue_orders(orders.ids)
+        return res
+
     @api.constrains('lock_type', 'lock_code')
     def _check_lock_code_format(self):
         for device in self:
@@ -195,6 +321,7 @@ class RepairDevice(models.Model):
                 if not device.lock_code.isalnum():
                     raise ValidationError("La contraseña debe ser alfanumérica.")
 
+    @profiled('action')
     def action_view_repairs(self):
         self.ensure_one()
         return {
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo import models, api
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+
+class IrSequence(models.Model):
+    """Reserva de bloques de números para altas masivas."""
+    _inherit = 'ir.sequence'
+
+    def _reserve_numbers(self, count, date_range=None):
+        """Reserva ``count`` números de la secuencia en una sola operación.
+
+        En las secuencias ``no_gap`` el bloque se reserva con un único UPDATE
+        sobre la fila de la secuencia, que queda bloqueada hasta el final de la
+        transacción: los números son consecutivos y sin huecos aunque haya
+        varios trabajadores a la vez. En las ``standard`` se piden todos los
+        valores a la secuencia de PostgreSQL de una vez.
+        """
+        self.ensure_one()
+        record = date_range or self
+        if self.implementation == 'standard':
+            seq_name = 'ir_sequence_%03d' % self.id
+            if date_range:
+                seq_name = 'ir_sequence_%03d_%03d' % (self.id, date_range.id)
+            self.env.cr.execute(
+                SQL("SELECT nextval(%s) FROM generate_series(1, %s)", seq_name, count)
+            )
+            return [row[0] for row in self.env.cr.fetchall()]
+
+        record.flush_recordset(['number_next'])
+        self.env.cr.execute(SQL(
+            "UPDATE %s SET number_next = number_next + %s WHERE id = %s RETURNING number_next - %s",
+            SQL.identifier(record._table),
+            count * self.number_increment,
+            record.id,
+            count * self.number_increment,
+        ))
+        first = self.env.cr.fetchone()[0]
+        record.invalidate_recordset(['number_next'])
+        return [first + i * self.number_increment for i in range(count)]
+
+    def _next_block(self, count, sequence_date=None):
+        """Equivalente a ``_next`` que devuelve ``count`` referencias."""
+        self.ensure_one()
+        if count <= 0:
+            return []
+        if not self.use_date_range:
+            return [self.get_next_char(number) for number in self._reserve_numbers(count)]
+        date_range = self._get_current_sequence(sequence_date=sequence_date)
+        sequence = self.with_context(
+            ir_sequence_date_range=date_range.date_from,
+            ir_sequence_date_range_end=date_range.date_to,
+        )
+        return [sequence.get_next_char(number) for number in self._reserve_numbers(count, date_range)]
+
+    @api.model
+    def next_block_by_code(self, sequence_code, count, sequence_date=None):
+        """Como ``next_by_code`` pero reservando ``count`` referencias a la vez.
+
+        Devuelve una lista vacía si no existe la secuencia.
+        """
+        self.check_access('read')
+        company_id = self.env.company.id
+        seq_ids = self.search(
+            [('code', '=', sequence_code), ('company_id', 'in', [company_id, False])], order='company_id'
+        )
+        if not seq_ids:
+            _logger.debug("No ir.sequence has been found for code '%s'. Please make sure a sequence is set for current company." % sequence_code)
+            return []
+        return seq_ids[0]._next_block(count, sequence_date=sequence_date)
+
+    def _switch_to_no_gap(self):
+        """Pasa las secuencias a ``no_gap`` con tramos por año conservando el siguiente número.
+
+        El tramo del año en curso continúa donde iba la secuencia; los años
+        siguientes empiezan por 1.
+        """
+        for sequence in self:
+            vals = {}
+            if sequence.implementation == 'standard':
+                vals['implementation'] = 'no_gap'
+            if not sequence.use_date_range:
+                vals['use_date_range'] = True
+            if not vals:
+                continue
+            number_next = sequence.number_next_actual
+            sequence.write({**vals, 'number_next': number_next})
+            if 'use_date_range' in vals:
+                sequence._get_current_sequence().number_next = number_next
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+import difflib
+
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+
+
+class RepairAuditLog(models.Model):
+    """Diario de cambios de solo inserción para los textos largos de las órdenes.
+
+    Sustituye al seguimiento del chatter en los campos de texto cuando el modo
+    de auditoría está activo: cada cambio guarda solo el diff del texto.
+    """
+    _name = 'mobile.repair.audit.log'
+    _description = 'Historial de Cambios de Reparación'
+    _order = 'date desc, id desc'
+    _log_access = False
+
+    order_id = fields.Many2one('mobile.repair.order', string='Orden', required=True, index=True, ondelete='cascade', readonly=True)
+    user_id = fields.Many2one('res.users', string='Usuario', readonly=True)
+    date = fields.Datetime(string='Fecha', readonly=True, default=fields.Datetime.now)
+    field_name = fields.Char(string='Campo', readonly=True)
+    field_label = fields.Char(string='Descripción del Campo', readonly=True)
+    diff = fields.Text(string='Cambios', readonly=True)
+
+    def write(self, vals):
+        raise UserError("El historial de cambios no se puede modificar.")
+
+    def unlink(self):
+        raise UserError("El historial de cambios no se puede eliminar.")
+
+    @api.model
+    def _text_diff(self, old, new):
+        """Diff unificado compacto entre dos textos (sin cabeceras)."""
+        lines = difflib.unified_diff((old or '').splitlines(), (new or '').splitlines(), lineterm='', n=1)
+        return '\n'.join(line for line in lines if not line.startswith(('---', '+++')))
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+import functools
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import models, fields, api
+from odoo.http import request
+from odoo.modules.registry import Registry
+from odoo.tools import str2bool
+
+_logger = logging.getLogger(__name__)
+
+PROFILING_PARAM = 'mobile_repair_orders.profiling'
+# Segundos entre volcados del acumulador en memoria de cada proceso
+PROFILING_FLUSH_INTERVAL = 60
+PROFILING_RETENTION_DAYS = 30
+
+
+class MetricAggregator:
+    """Acumulador en memoria, por proceso, de las métricas instrumentadas.
+
+    Suma llamadas, registros, consultas y duración por base de datos, tipo y
+    nombre. Cada proceso vuelca su parte al modelo de métricas como mucho una
+    vez por ``PROFILING_FLUSH_INTERVAL`` segundos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: [0, 0, 0, 0.0, 0.0])
+        self._last_flush = defaultdict(time.monotonic)
+
+    def add(self, dbname, kind, name, records, queries, duration):
+        with self._lock:
+            stats = self._stats[dbname, kind, name]
+            stats[0] += 1
+            stats[1] += records
+            stats[2] += queries
+            stats[3] += duration
+            stats[4] = max(stats[4], duration)
+
+    def schedule_flush(self, dbname):
+        """Indica si toca volcar, reservando el turno para una sola petición.
+
+        Si esa petición no llega a hacer commit, los datos siguen en memoria
+        y se vuelcan en el siguiente turno.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_flush[dbname] < PROFILING_FLUSH_INTERVAL:
+                return False
+            self._last_flush[dbname] = now
+            return True
+
+    def drain(self, dbname):
+        """Extrae y reinicia los acumulados de una base de datos."""
+        with self._lock:
+            keys = [key for key in self._stats if key[0] == dbname]
+            return {key[1:]: self._stats.pop(key) for key in keys}
+
+
+aggregator = MetricAggregator()
+
+
+def _flush_metrics(dbname):
+    """Vuelca el acumulado del proceso con un cursor propio, tras el commit de la petición."""
+    try:
+        with Registry(dbname).cursor() as cr:
+            env = api.Environment(cr, api.SUPERUSER_ID, {})
+            env['mobile.repair.metric']._flush()
+    except Exception:
+        _logger.exception("No se pudieron guardar las métricas de rendimiento")
+
+
+def profiled(kind):
+    """Instrumenta un cálculo, acción o ruta cuando el perfilado está activo.
+
+    Registra llamadas, registros procesados, consultas SQL y duración. Las
+    cifras de cada llamada incluyen las de los métodos instrumentados que
+    ejecute por dentro. Con el perfilado desactivado solo se lee el parámetro,
+    que el ORM sirve desde su caché.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            env = self.env if isinstance(self, models.BaseModel) else request.env
+            if not str2bool(env['ir.config_parameter'].sudo().get_param(PROFILING_PARAM, 'False')):
+                return method(self, *args, **kwargs)
+            cr = env.cr
+            queries_before = cr.sql_log_count
+            start = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                is_model = isinstance(self, models.BaseModel)
+                aggregator.add(
+                    cr.dbname, kind,
+                    f'{self._name if is_model else type(self).__name__}.{method.__name__}',
+                    len(self) if is_model else 0,
+                    cr.sql_log_count - queries_before,
+                    time.perf_counter() - start,
+                )
+                if aggregator.schedule_flush(cr.dbname):
+                    cr.postcommit.add(functools.partial(_flush_metrics, cr.dbname))
+        return wrapper
+    return decorator
+
+
+class RepairMetric(models.Model):
+    """Métricas de rendimiento de cálculos, acciones y rutas del módulo.
+
+    Cada fila agrupa lo medido por un proceso entre dos volcados. Se activan
+    con el parámetro del sistema ``mobile_repair_orders.profiling``.
+    """
+    _name = 'mobile.repair.metric'
+    _description = 'Métrica de Rendimiento de Reparaciones'
+    _order = 'date desc, duration_total desc'
+    _log_access = False
+
+    date = fields.Datetime(string='Fecha', required=True, index=True, default=fields.Datetime.now, readonly=True)
+    kind = fields.Selection([
+        ('compute', 'Cálculo'),
+        ('action', 'Acción'),
+        ('route', 'Ruta'),
+    ], string='Tipo', required=True, readonly=True)
+    name = fields.Char(string='Método', required=True, index=True, readonly=True)
+    call_count = fields.Integer(string='Llamadas', readonly=True)
+    record_count = fields.Integer(string='Registros', readonly=True)
+    query_count = fields.Integer(string='Consultas SQL', readonly=True)
+    duration_total = fields.Float(string='Duración Total (ms)', digits=(16, 1), readonly=True)
+    duration_max = fields.Float(string='Duración Máxima (ms)', digits=(16, 1), readonly=True, aggregator='max')
+    duration_avg = fields.Float(string='Duración Media (ms)', digits=(16, 2), compute='_compute_duration_avg')
+
+    @api.depends('duration_total', 'call_count')
+    def _compute_duration_avg(self):
+        for metric in self:
+            metric.duration_avg = metric.duration_total / metric.call_count if metric.call_count else 0.0
+
+    @api.model
+    def _flush(self):
+        """Guarda el acumulado en memoria de este proceso para la base de datos actual."""
+        stats = aggregator.drain(self.env.cr.dbname)
+        if not stats:
+            return 0
+        self.sudo().create([
+            {
+                'kind': kind,
+                'name': name,
+                'call_count': calls,
+                'record_count': records,
+                'query_count': queries,
+                'duration_total': duration * 1000.0,
+                'duration_max': duration_max * 1000.0,
+            }
+            for (kind, name), (calls, records, queries, duration, duration_max) in stats.items()
+        ])
+        return len(stats)
+
+    @api.model
+    def _cron_flush_metrics(self):
+        """Vuelca las métricas del proceso de tareas programadas y purga las antiguas."""
+        self._flush()
+        self.sudo().search([
+            ('date', '<', fields.Datetime.now() - timedelta(days=PROFILING_RETENTION_DAYS)),
+        ]).unlink()
+
+    @api.model
+    def _get_top_offenders(self, hours=24, limit=20, order='duration_total'):
+        """Métodos con más coste en las últimas ``hours`` horas.
+
+        Agrupa por tipo y método con una única consulta. ``order`` admite
+        ``duration_total``, ``query_count``, ``call_count`` o ``duration_max``.
+        """
+        self.check_access('read')
+        if order not in ('duration_total', 'query_count', 'call_count', 'duration_max'):
+            order = 'duration_total'
+        groups = self._read_group(
+            [('date', '>=', fields.Datetime.now() - timedelta(hours=hours))],
+            ['kind', 'name'],
+            ['call_count:sum', 'record_count:sum', 'query_count:sum', 'duration_total:sum', 'duration_max:max'],
+            order=f'{order}:{"max" if order == "duration_max" else "sum"} desc',
+            limit=limit,
+        )
+        return [
+            {
+                'kind': kind,
+                'name': name,
+                'call_count': calls,
+                'record_count': records,
+                'query_count': queries,
+                'duration_total': round(duration, 1),
+                'duration_avg': round(duration / calls, 2) if calls else 0.0,
+                'duration_max': round(duration_max, 1),
+            }
+            for kind, name, calls, records, queries, duration, duration_max in groups
+        ]
@@ -1,7 +1,90 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+from itertools import zip_longest
+
+from dateutil.relativedelta import relativedelta
+from markupsafe import Markup
+
+from odoo import models, fields, api, tools
 from odoo.exceptions import ValidationError, UserError
+from odoo.tools import SQL, split_every, str2bool
+
+from .repair_metric import profiled
+from .repair_search import normalize_phone_key, normalize_search_text
+
+_logger = logging.getLogger(__name__)
+
+ARCHIVE_MONTHS_PARAM = 'mobile_repair_orders.archive_after_months'
+ARCHIVE_DEFAULT_MONTHS = 12
+ARCHIVE_BATCH_SIZE = 1000
+
+# Modo de auditoría: los textos largos se registran en el diario de cambios
+# en lugar de en el seguimiento del chatter
+AUDIT_MODE_PARAM = 'mobile_repair_orders.audit_mode'
+AUDIT_TEXT_FIELDS = ('diagnosis', 'solution_applied', 'problem_description')
+AUDIT_BUFFER_KEY = 'mobile_repair_orders.audit_log'
+
+# Seguimiento del plazo prometido: estados vigilados, margen de aviso y campos
+# que obligan a reevaluarlo
+SLA_AT_RISK_HOURS_PARAM = 'mobile_repair_orders.sla_at_risk_hours'
+SLA_DEFAULT_AT_RISK_HOURS = 24
+SLA_OPEN_STATES = ('draft', 'in_repair')
+SLA_BATCH_SIZE = 1000
+SLA_TRIGGER_FIELDS = {'state', 'date_promised', 'active', 'technician_id'}
+SLA_ACTIVITY_SUMMARIES = {
+    'at_risk': 'Reparación a punto de vencer',
+    'overdue': 'Reparación vencida',
+}
+
+# Campos de la orden que alimentan el análisis por problema
+REPORT_PROBLEM_FIELDS = {
+    'problem_ids', 'state', 'technician_id', 'device_id', 'company_id',
+    'date_received', 'date_started', 'date_completed', 'order_line',
+}
+
+# Banco de trabajo de técnicos: estados de la cola y campos de cada tarjeta
+WORKBENCH_STATES = ('draft', 'in_repair', 'repaired')
+WORKBENCH_FIELDS = ['name', 'device_info', 'priority', 'date_promised', 'state']
+WORKBENCH_NOTIFICATION = 'mobile_repair/workbench'
+WORKBENCH_FIELDS_SET = set(WORKBENCH_FIELDS) | {'technician_id'}
+
+# Paginación por cursor del listado de órdenes
+KEYSET_DEFAULT_FIELDS = [
+    'name', 'partner_id', 'device_info', 'state', 'priority', 'technician_id',
+    'date_received', 'date_promised', 'sla_status', 'amount_total',
+]
+KEYSET_MAX_LIMIT = 200
+
+# Presentación de estados en el widget de reparaciones recientes
+RECENT_REPAIRS_STATE_COLORS = {
+    'draft': 'secondary',
+    'in_repair': 'warning',
+    'repaired': 'success',
+    'delivered': 'primary',
+    'cancelled': 'danger',
+}
+RECENT_REPAIRS_STATE_ICONS = {
+    'draft': '📥',
+    'in_repair': '🔧',
+    'repaired': '✅',
+    'delivered': '📦',
+    'cancelled': '❌',
+}
+RECENT_REPAIRS_STATE_LABELS = {
+    'draft': 'Recibida',
+    'in_repair': 'En Reparación',
+    'repaired': 'Lista',
+    'delivered': 'Entregada',
+    'cancelled': 'Cancelada',
+}
 
 class RepairOrderLine(models.Model):
     """Línea de presupuesto para una orden de reparación. Puede ser un producto o un servicio."""
@@ -25,6 +108,12 @@ class RepairOrderLine(models.Model):
     product_uom_category_id = fields.Many2one(related='product_id.uom_id.category_id')
     
     price_unit = fields.Float(string='Precio Unitario', digits='Product Price')
+    cost_price = fields.Float(
+        string='Coste Unitario', digits='Product Price', compute='_compute_cost_price', store=True,
+        readonly=False, precompute=True,
+        help="Coste del producto congelado al presupuestar y al consumir el repuesto. "
+             "Los cambios posteriores del coste del producto no afectan a la línea."
+    )
     discount = fields.Float(string='Descuento (%)', digits='Discount', default=0.0)
     tax_id = fields.Many2many('account.tax', string='Impuestos', domain=['|', ('active', '=', False), ('active', '=', True)])
     
@@ -33,22 +122,62 @@ class RepairOrderLine(models.Model):
     price_total = fields.Monetary(string='Total', currency_field='currency_id', compute='_compute_amount', store=True)
 
     @api.depends('product_uom_qty', 'discount', 'price_unit', 'tax_id')
+    @profiled('compute')
     def _compute_amount(self):
-        """Calcula los importes de la línea, aplicando descuentos e impuestos."""
+        """Calcula los importes de la línea, aplicando descuentos e impuestos.
+
+        Las líneas con los mismos impuestos, moneda, cliente, producto, precio
+        y cantidad reutilizan el resultado de ``compute_all``. Sin impuestos el
+        resultado no depende del cliente ni del producto, así que esas líneas
+        se agrupan solo por moneda, precio y cantidad.
+        """
+        tax_results = {}
         for line in self:
             if line.display_type:
                 line.price_subtotal = line.price_total = 0.0
                 continue
             
+            order = line.repair_order_id
             price = line.price_unit * (1 - (line.discount or 0.0) / 100.0)
-            taxes = line.tax_id.compute_all(
+            tax_ids = tuple(line.tax_id.ids)
+            key = (
+                tax_ids,
+                order.currency_id.id,
+                order.partner_id.id if tax_ids else None,
+                line.product_id.id if tax_ids else None,
                 price,
-                line.repair_order_id.currency_id,
                 line.product_uom_qty,
-                product=line.product_id,
-                partner=line.repair_order_id.partner_id
             )
-            line.update({'price_subtotal': taxes['total_excluded'], 'price_total': taxes['total_included']})
+            if key not in tax_results:
+                taxes = line.tax_id.compute_all(
+                    price,
+                    order.currency_id,
+                    line.product_uom_qty,
+                    product=line.product_id,
+                    partner=order.partner_id
+                )
+                tax_results[key] = {'price_subtotal': taxes['total_excluded'], 'price_total': taxes['total_included']}
+            line.update(tax_results[key])
+
+    @api.depends('product_id')
+    @profiled('compute')
+    def _compute_cost_price(self):
+        """Toma el coste actual del producto como instantánea de la línea."""
+        for line in self:
+            if line.product_id and not line.display_type:
+                line.cost_price = line.product_id.with_company(line.repair_order_id.company_id).standard_price
+            else:
+                line.cost_price = 0.0
+
+    def _refresh_cost_price(self):
+        """Vuelve a tomar la instantánea del coste, p. ej. al consumir los repuestos.
+
+        Los valores asignados dentro de un cálculo no propagan dependencias,
+        así que el margen de las órdenes se marca también para recalcularse.
+        """
+        self.env.add_to_compute(self._fields['cost_price'], self)
+        orders = self.repair_order_id
+        self.env.add_to_compute(orders._fields['margin'], orders)
 
     @api.onchange('product_id')
     def _onchange_product_id(self):
@@ -77,10 +206,16 @@ class RepairOrder(models.Model):
         return self.env.company.currency_id.id
 
     name = fields.Char(string='Número', required=True, copy=False, readonly=True, index=True, default='Nuevo')
+    active = fields.Boolean(
+        string='Activo', default=True, copy=False,
+        help="Las órdenes entregadas o canceladas hace tiempo se archivan para "
+             "sacarlas del conjunto de trabajo. Siguen disponibles con el filtro Archivadas."
+    )
     partner_id = fields.Many2one('res.partner', string='Cliente', required=True, tracking=True, index=True, ondelete='restrict')
     device_id = fields.Many2one('mobile.repair.device', string='Dispositivo', required=True, tracking=True, index=True, ondelete='restrict')
     partner_phone = fields.Char(related='partner_id.phone', string='Teléfono', readonly=True, store=True, index=True)
     partner_email = fields.Char(related='partner_id.email', string='Email', readonly=True, store=True, index=True)
+    partner_phone_key = fields.Char(related='partner_id.phone_key', string='Clave Teléfono', readonly=True, store=True, index=True)
     problem_ids = fields.Many2many('mobile.repair.problem', 'mobile_repair_problem_order_rel', 'order_id', 'problem_id', string='Problemas Reportados', required=True, tracking=True)
     device_condition = fields.Text(string='Condición del Dispositivo')
     accessories_included = fields.Text(string='Accesorios Incluidos')
@@ -88,6 +223,13 @@ class RepairOrder(models.Model):
     date_start = fields.Datetime(string='Fecha de Inicio', tracking=True)
     date_finished = fields.Datetime(string='Fecha de Finalización', tracking=True)
     date_promised = fields.Datetime(string='Fecha Prometida', tracking=True, index=True)
+    sla_status = fields.Selection([
+        ('on_time', 'En Plazo'),
+        ('at_risk', 'En Riesgo'),
+        ('overdue', 'Vencida'),
+    ], string='Estado del Plazo', readonly=True, copy=False, index='btree_not_null',
+        help="Situación de las órdenes abiertas respecto a la fecha prometida. "
+             "La actualiza una tarea programada; las órdenes cerradas no tienen valor.")
     problem_description = fields.Text(string='Detalles Adicionales', tracking=True)
     
     # ESTADOS CORREGIDOS según requerimientos
@@ -135,20 +277,36 @@ class RepairOrder(models.Model):
 
     problem_count = fields.Integer(string="Problem Count", compute='_compute_problem_count', store=True)
     progress_percentage = fields.Integer(string="Progress Percentage", compute='_compute_progress_percentage', store=True)
-    technician_image = fields.Binary(related='technician_id.image_128', string="Technician Avatar", readonly=True)
     margin = fields.Monetary(string='Margen de Beneficio', compute='_compute_margin', store=True)
     commission_amount = fields.Monetary(string='Comisiones Pagadas', compute='_compute_commission_amount', store=True)
     repair_time = fields.Float(string='Tiempo Promedio Reparación (Días)', compute='_compute_repair_time', store=True)
+    search_text = fields.Char(
+        string='Texto de Búsqueda', compute='_compute_search_text', store=True, index='trigram',
+        help="Número, cliente, teléfono, email, IMEI, código de dispositivo y detalles normalizados para la búsqueda de mostrador."
+    )
+    audit_log_ids = fields.One2many('mobile.repair.audit.log', 'order_id', string='Historial de Cambios', readonly=True)
 
     # --- MÉTODOS DE CÓMPUTO ---
 
     @api.depends('problem_ids')
+    @profiled('compute')
     def _compute_problem_count(self):
         """Cuenta el número de problemas asociados."""
         for order in self:
             order.problem_count = len(order.problem_ids) if order.problem_ids else 0
 
+    @api.depends('name', 'partner_id.name', 'partner_phone', 'partner_email',
+                 'device_id.imei', 'device_id.device_code', 'problem_description')
+    @profiled('compute')
+    def _compute_search_text(self):
+        for order in self:
+            order.search_text = normalize_search_text(
+                order.name, order.partner_id.name, order.partner_phone, order.partner_email,
+                order.device_id.imei, order.device_id.device_code, order.problem_description,
+            )
+
     @api.depends('state')
+    @profiled('compute')
     def _compute_progress_percentage(self):
         """Calcula el porcentaje de progreso basado en el estado."""
         for order in self:
@@ -161,9 +319,15 @@ class RepairOrder(models.Model):
             }
             order.progress_percentage = progress_map.get(order.state, 0)
 
-    @api.depends('amount_total', 'order_line', 'order_line.product_id', 'order_line.product_id.standard_price', 'order_line.product_uom_qty')
+    @api.depends('amount_total', 'order_line', 'order_line.cost_price', 'order_line.product_uom_qty')
+    @profiled('compute')
     def _compute_margin(self):
-        """Calcula el margen de beneficio."""
+        """Calcula el margen de beneficio a partir del coste congelado en cada línea.
+
+        No depende del coste actual de los productos, de modo que una
+        revalorización no recalcula el histórico de órdenes. Para reescribirlo
+        a propósito existe ``_revalue_margins``.
+        """
         for order in self:
             if not order.order_line or not order.amount_total:
                 order.margin = 0.0
@@ -172,24 +336,111 @@ class RepairOrder(models.Model):
             total_cost = 0.0
             for line in order.order_line:
                 # Solo calcular costo para líneas con producto y que no sean display_type
-                if line.product_id and not line.display_type and line.product_id.standard_price:
-                    line_cost = line.product_id.standard_price * (line.product_uom_qty or 0.0)
-                    total_cost += line_cost
+                if line.product_id and not line.display_type:
+                    total_cost += line.cost_price * (line.product_uom_qty or 0.0)
             
             order.margin = order.amount_total - total_cost
+        self.env['mobile.repair.report.daily']._queue_orders(self.ids)
+
+    @api.model
+    def _revalue_margins(self, domain=None, batch_size=500):
+        """Reescribe costes y márgenes con el coste actual de los productos.
+
+        Procesa las órdenes del dominio por bloques. Cada bloque se guarda y se
+        confirma por separado, de modo que no se mantienen bloqueos sobre todas
+        las órdenes y líneas hasta el final. Devuelve el número de órdenes
+        revalorizadas.
+        """
+        order_ids = self.with_context(active_test=False).search(domain or []).ids
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        for batch_ids in split_every(batch_size, order_ids):
+            orders = self.browse(batch_ids)
+            orders.order_line._refresh_cost_price()
+            self.env.flush_all()
+            if auto_commit:
+                self.env.cr.commit()
+            self.env.invalidate_all()
+        return len(order_ids)
 
-    @api.depends('amount_total', 'technician_id')
+    @api.depends('amount_total', 'technician_id', 'problem_ids.category_id', 'date_received')
+    @profiled('compute')
     def _compute_commission_amount(self):
-        """Calcula el monto de comisiones."""
+        """Calcula el monto de comisiones según las reglas de comisión.
+
+        Las reglas se evalúan sobre una tabla compilada en memoria. Si hay
+        tramos por volumen, el volumen mensual de los técnicos implicados se
+        obtiene con una única consulta agrupada para todo el lote.
+        """
+        CommissionRule = self.env['mobile.repair.commission.rule']
+        table = CommissionRule._get_commission_table()
+        volumes = self._get_technician_monthly_volumes() if CommissionRule._has_volume_tiers(table) else {}
         for order in self:
             if order.technician_id and order.amount_total > 0:
-                # Ejemplo: 5% de comisión - puedes ajustar según tu lógica de negocio
-                commission_rate = 0.05
-                order.commission_amount = order.amount_total * commission_rate
+                month = order.date_received and order.date_received.date().replace(day=1)
+                rate = CommissionRule._get_commission_rate(
+                    table,
+                    order.technician_id.id,
+                    order.problem_ids.category_id.ids,
+                    volumes.get((order.technician_id.id, month), 0.0),
+                )
+                order.commission_amount = order.amount_total * rate
             else:
                 order.commission_amount = 0.0
+        self.env['mobile.repair.report.daily']._queue_orders(self.ids)
+
+    def _get_technician_monthly_volumes(self):
+        """Facturación mensual (órdenes no canceladas) de los técnicos de las órdenes.
+
+        Devuelve ``{(technician_id, primer_día_del_mes): importe}`` cubriendo los
+        meses de recepción de las órdenes de ``self``. Los meses se cuentan en
+        UTC, igual que los busca ``_compute_commission_amount`` y que los
+        límites de ``_close_commission_period``, sea cual sea la zona horaria
+        del usuario.
+        """
+        orders = self.filtered(lambda o: o.technician_id and o.date_received)
+        if not orders:
+            return {}
+        dates = orders.mapped('date_received')
+        date_from = min(dates).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        date_to = max(dates).replace(day=1, hour=0, minute=0, second=0, microsecond=0) + relativedelta(months=1)
+        groups = self.with_context(active_test=False, tz='UTC')._read_group(
+            [
+                ('technician_id', 'in', orders.technician_id.ids),
+                ('state', '!=', 'cancelled'),
+                ('date_received', '>=', date_from),
+                ('date_received', '<', date_to),
+            ],
+            ['technician_id', 'date_received:month'],
+            ['amount_total:sum'],
+        )
+        return {
+            (technician.id, month.date() if isinstance(month, datetime) else month): amount
+            for technician, month, amount in groups
+        }
+
+    @api.model
+    def _close_commission_period(self, date_from=None, date_to=None):
+        """Recalcula las comisiones de un periodo completo para todos los técnicos.
+
+        Por defecto cierra el mes anterior. El recálculo del lote hace una
+        consulta para las órdenes, otra para los volúmenes y las escrituras
+        agrupadas del ORM.
+        """
+        if not date_from:
+            date_from = fields.Date.today().replace(day=1) - relativedelta(months=1)
+        if not date_to:
+            date_to = date_from + relativedelta(months=1)
+        orders = self.with_context(active_test=False).search([
+            ('technician_id', '!=', False),
+            ('date_received', '>=', date_from),
+            ('date_received', '<', date_to),
+        ])
+        self.env.add_to_compute(self._fields['commission_amount'], orders)
+        orders.flush_recordset(['commission_amount'])
+        return len(orders)
 
     @api.depends('date_started', 'date_completed')
+    @profiled('compute')
     def _compute_repair_time(self):
         """Calcula el tiempo de reparación en días."""
         for order in self:
@@ -224,12 +475,14 @@ class RepairOrder(models.Model):
                         f"En orden {order.name}: La fecha de finalización no puede ser anterior a la fecha de inicio"
                     )
 
+    @profiled('compute')
     def _compute_picking_count(self):
         """Cuenta las transferencias de stock asociadas."""
         for order in self:
             order.picking_count = 1 if order.stock_picking_id else 0
 
     @api.depends('order_line', 'order_line.price_subtotal', 'order_line.price_total')
+    @profiled('compute')
     def _compute_amounts(self):
         """Calcula los importes totales de la orden."""
         for order in self:
@@ -242,8 +495,11 @@ class RepairOrder(models.Model):
             order.amount_untaxed = sum(valid_lines.mapped('price_subtotal'))
             order.amount_total = sum(valid_lines.mapped('price_total'))
             order.amount_tax = order.amount_total - order.amount_untaxed
+        self.env['mobile.repair.report.daily']._queue_orders(self.ids)
+        self.env['mobile.repair.report.problem']._queue_orders(self.ids)
     
     @api.depends('sale_order_id', 'sale_order_id.invoice_ids')
+    @profiled('compute')
     def _compute_invoice_id(self):
         """Obtiene la factura asociada desde la orden de venta."""
         for order in self:
@@ -254,6 +510,7 @@ class RepairOrder(models.Model):
                 order.invoice_id = False
     
     @api.depends('invoice_id', 'invoice_id.payment_state')
+    @profiled('compute')
     def _compute_invoiced(self):
         """Determina si la orden está facturada y pagada."""
         for order in self:
@@ -263,6 +520,7 @@ class RepairOrder(models.Model):
                 order.invoiced = False
 
     @api.depends('device_id', 'device_id.display_name')
+    @profiled('compute')
     def _compute_device_info(self):
         """Genera información legible del dispositivo."""
         for record in self:
@@ -272,106 +530,218 @@ class RepairOrder(models.Model):
                 record.device_info = "Sin dispositivo"
 
     # --- MÉTODOS DE ACCIÓN CORREGIDOS PARA NUEVOS ESTADOS ---
+    # Todas las acciones trabajan sobre conjuntos de órdenes: validan el lote
+    # completo antes de modificar nada, hacen una escritura por estado destino
+    # y registran los mensajes del chatter en bloque.
+
+    def _check_transition(self, allowed_states, action_label):
+        """Valida que todas las órdenes admitan la transición solicitada."""
+        invalid = self.filtered(lambda o: o.state not in allowed_states)
+        if invalid:
+            raise UserError(
+                f"No se puede {action_label} en las siguientes órdenes por su estado actual: "
+                f"{', '.join(invalid.mapped('name'))}"
+            )
+
+    def _log_transition(self, message, default_technician='Técnico'):
+        """Registra en el chatter de todas las órdenes un mensaje de transición."""
+        self._message_log_batch(
+            bodies={
+                order.id: Markup(message) % (order.technician_id.name or default_technician)
+                for order in self
+            },
+            message_type='comment',
+        )
+
+    @profiled('action')
     def action_start_repair(self):
         """Inicia la reparación (draft -> in_repair)"""
-        self.ensure_one()
-        if not self.technician_id:
-            raise UserError("Debe asignar un técnico antes de iniciar la reparación.")
-        
+        self._check_transition(['draft'], "iniciar la reparación")
+        without_technician = self.filtered(lambda o: not o.technician_id)
+        if without_technician:
+            raise UserError(
+                "Debe asignar un técnico antes de iniciar la reparación: "
+                f"{', '.join(without_technician.mapped('name'))}"
+            )
+
         # Crear picking de stock si hay productos físicos
-        if not self.stock_picking_id and self.order_line.filtered(lambda l: l.product_id and l.product_id.type == 'product'):
-            self._create_stock_picking()
-        
+        self.filtered(lambda o: not o.stock_picking_id)._create_stock_picking()
+
         # Actualizar estado y fecha de inicio
         self.write({
-            'state': 'in_repair', 
+            'state': 'in_repair',
             'date_started': fields.Datetime.now()
         })
-        
+
         # Enviar mensaje en el chatter
-        self.message_post(
-            body=f"Reparación iniciada por {self.technician_id.name}",
-            message_type='comment'
-        )
-        
+        self._log_transition("Reparación iniciada por %s")
+
         return True
 
+    @profiled('action')
     def action_mark_repaired(self):
         """Marca como reparado (in_repair -> repaired)"""
-        self.ensure_one()
-        
-        # Validar el picking de stock si existe
-        if self.stock_picking_id and self.stock_picking_id.state == 'assigned':
+        self._check_transition(['in_repair'], "marcar como reparado")
+
+        # Validar en bloque los pickings de stock reservados, sin tocar los
+        # repuestos de otras órdenes de la misma oleada
+        pickings = self._split_shared_pickings().filtered(lambda p: p.state == 'assigned')
+        if pickings:
             try:
-                self.stock_picking_id.button_validate()
+                pickings.button_validate()
             except UserError as e:
                 raise UserError(f"Error al validar transferencia de stock: {e}")
-        
+
+        # Congelar el coste de los repuestos consumidos
+        self.order_line._refresh_cost_price()
+
         # Actualizar estado y fecha de finalización
         self.write({
-            'state': 'repaired', 
+            'state': 'repaired',
             'date_completed': fields.Datetime.now()
         })
-        
+
         # Enviar mensaje en el chatter
-        self.message_post(
-            body=f"Reparación completada por {self.technician_id.name or 'Técnico'}",
-            message_type='comment'
-        )
-        
+        self._log_transition("Reparación completada por %s")
+
         return True
-    
+
+    @profiled('action')
     def action_deliver(self):
         """Entrega el dispositivo (repaired -> delivered)"""
-        self.ensure_one()
+        self._check_transition(['repaired'], "entregar el dispositivo")
         self.write({'state': 'delivered', 'date_delivered': fields.Datetime.now()})
         return True
 
+    @profiled('action')
     def action_cancel(self):
-        """Cancela la orden"""
-        if self.stock_picking_id: 
-            self.stock_picking_id.action_cancel()
+        """Cancela la orden (draft, in_repair, repaired -> cancelled)"""
+        self._check_transition(['draft', 'in_repair', 'repaired'], "cancelar la orden")
+        pickings = self._split_shared_pickings()
+        if pickings:
+            pickings.action_cancel()
         self.write({'state': 'cancelled'})
         return True
-    
+
+    @profiled('action')
     def action_reset_to_draft(self):
-        """Regresa a borrador"""
-        self.ensure_one()
-        self.write({'state': 'draft'})
+        """Regresa a borrador (in_repair, cancelled -> draft)
+
+        Se borran las fechas de reparación y, en las canceladas, el enlace a
+        la transferencia cancelada, para que al reiniciar se prepare otra.
+        """
+        self._check_transition(['in_repair', 'cancelled'], "volver a borrador")
+        self.filtered(lambda o: o.stock_picking_id.state == 'cancel').stock_picking_id = False
+        self.write({'state': 'draft', 'date_started': False, 'date_completed': False})
         return True
-    
-    def _create_stock_picking(self):
-        self.ensure_one()
-        picking_type = self.env['stock.picking.type'].search([
-            ('code', '=', 'outgoing'), ('warehouse_id.company_id', '=', self.company_id.id)], limit=1)
-        if not picking_type: 
-            raise UserError("No se encontró un tipo de albarán de 'Salidas' para su almacén.")
-        
-        storable_lines = self.order_line.filtered(lambda l: not l.display_type and l.product_id.type == 'product')
-        if not storable_lines: 
-            return
-        
-        picking = self.env['stock.picking'].create({
-            'partner_id': self.partner_id.id, 
-            'picking_type_id': picking_type.id,
-            'location_id': self.location_id.id, 
-            'location_dest_id': self.env.ref('stock.stock_location_customers').id,
-            'origin': self.name, 
-            'company_id': self.company_id.id,
-            'move_ids': [(0, 0, {
-                'name': line.product_id.name, 
-                'product_id': line.product_id.id,
-                'product_uom_qty': line.product_uom_qty, 
-                'product_uom': line.product_uom.id,
-                'location_id': self.location_id.id, 
-                'location_dest_id': self.env.ref('stock.stock_location_customers').id
-            }) for line in storable_lines],
-        })
-        picking.action_confirm()
-        picking.action_assign()
-        self.stock_picking_id = picking.id
-        return picking
 
+    def _get_storable_lines(self):
+        return self.order_line.filtered(lambda l: not l.display_type and l.product_id.is_storable)
+
+    def _create_stock_picking(self, grouped=False):
+        """Crea las transferencias de repuestos de un conjunto de órdenes.
+
+        Los tipos de albarán y la ubicación de clientes se resuelven una vez
+        por compañía, todas las transferencias se crean con un único ``create``
+        y se confirman y reservan juntas. Con ``grouped`` se genera una sola
+        transferencia por almacén y ubicación de origen (una oleada), de modo
+        que el almacén de repuestos reserva el stock de todo un turno de una vez.
+        """
+        orders = self.filtered(lambda o: o._get_storable_lines())
+        if not orders:
+            return self.env['stock.picking']
+
+        picking_types = self.env['stock.picking.type'].search([
+            ('code', '=', 'outgoing'), ('warehouse_id.company_id', 'in', orders.company_id.ids)])
+        picking_type_by_company = {}
+        for picking_type in picking_types:
+            picking_type_by_company.setdefault(picking_type.warehouse_id.company_id.id, picking_type)
+        missing = orders.company_id.filtered(lambda c: c.id not in picking_type_by_company)
+        if missing:
+            raise UserError(
+                "No se encontró un tipo de albarán de 'Salidas' para su almacén "
+                f"({', '.join(missing.mapped('name'))})."
+            )
+        customer_location = self.env.ref('stock.stock_location_customers')
+
+        groups = defaultdict(lambda: self.env['mobile.repair.order'])
+        for order in orders:
+            key = (order.company_id.id, order.location_id.id) if grouped else (order.id,)
+            groups[key] |= order
+
+        picking_vals_list = []
+        for group_orders in groups.values():
+            first = group_orders[0]
+            picking_vals_list.append({
+                'partner_id': first.partner_id.id if len(group_orders.partner_id) == 1 else False,
+                'picking_type_id': picking_type_by_company[first.company_id.id].id,
+                'location_id': first.location_id.id,
+                'location_dest_id': customer_location.id,
+                'origin': ', '.join(group_orders.mapped('name')),
+                'company_id': first.company_id.id,
+                'move_ids': [(0, 0, {
+                    'name': line.product_id.name,
+                    'origin': order.name,
+                    'product_id': line.product_id.id,
+                    'product_uom_qty': line.product_uom_qty,
+                    'product_uom': line.product_uom.id,
+                    'location_id': order.location_id.id,
+                    'location_dest_id': customer_location.id,
+                    'repair_order_id': order.id,
+                }) for order in group_orders for line in order._get_storable_lines()],
+            })
+
+        pickings = self.env['stock.picking'].create(picking_vals_list)
+        pickings.action_confirm()
+        pickings.action_assign()
+        for group_orders, picking in zip(groups.values(), pickings):
+            group_orders.stock_picking_id = picking
+        return pickings
+
+    def _split_shared_pickings(self):
+        """Transferencias de las órdenes con solo sus propios movimientos.
+
+        Si una transferencia de oleada incluye repuestos de otras órdenes, los
+        movimientos de estas órdenes (con su reserva) pasan a una transferencia
+        nueva, de modo que validarla o cancelarla no afecta al resto. Las
+        demás órdenes se buscan sin reglas de registro ni filtro de archivadas:
+        un técnico no ve las órdenes de sus compañeros, pero comparten oleada.
+        """
+        pickings = self.stock_picking_id
+        if not pickings:
+            return pickings
+        others = self.sudo().with_context(active_test=False).search([
+            ('stock_picking_id', 'in', pickings.ids), ('id', 'not in', self.ids),
+        ])
+        for picking in pickings.filtered(lambda p: p.id in others.stock_picking_id.ids):
+            orders = self.filtered(lambda o: o.stock_picking_id == picking)
+            moves = picking.move_ids.filtered(lambda m: m.repair_order_id in orders)
+            new_picking = picking.copy({
+                'move_ids': [],
+                'origin': ', '.join(orders.mapped('name')),
+                'partner_id': orders.partner_id.id if len(orders.partner_id) == 1 else False,
+            })
+            moves.write({'picking_id': new_picking.id})
+            moves.move_line_ids.write({'picking_id': new_picking.id})
+            picking.origin = ', '.join(others.filtered(lambda o: o.stock_picking_id == picking).mapped('name'))
+            orders.stock_picking_id = new_picking
+        return self.stock_picking_id
+
+    @profiled('action')
+    def action_create_grouped_picking(self):
+        """Prepara en una sola transferencia por almacén los repuestos de las órdenes seleccionadas."""
+        orders = self.filtered(lambda o: o.state in ('draft', 'in_repair') and not o.stock_picking_id)
+        pickings = orders._create_stock_picking(grouped=True)
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Transferencias de Stock',
+            'res_model': 'stock.picking',
+            'view_mode': 'list,form',
+            'domain': [('id', 'in', pickings.ids)],
+            'target': 'current',
+        }
+
+    @profiled('action')
     def action_view_stock_picking(self):
         self.ensure_one()
         return {
@@ -383,6 +753,7 @@ class RepairOrder(models.Model):
             'target': 'current'
         }
 
+    @profiled('action')
     def action_create_invoice(self):
         self.ensure_one()
         if not self.order_line:
@@ -403,15 +774,80 @@ class RepairOrder(models.Model):
             'target': 'current',
         }
 
+    @profiled('action')
+    def action_create_invoice_batch(self):
+        """Factura en bloque las órdenes entregadas y aún sin factura.
+
+        Las órdenes se agrupan por compañía, cliente y moneda en una factura
+        consolidada por grupo. Todas las facturas se crean con un único
+        ``create``, se publican juntas y se enlazan a sus órdenes. Se informa
+        de las órdenes omitidas y del motivo.
+        """
+        skipped = {}
+        groups = defaultdict(lambda: self.env['mobile.repair.order'])
+        for order in self:
+            if order.state != 'delivered':
+                skipped[order] = "no está entregada"
+            elif order.invoice_id:
+                skipped[order] = f"ya tiene la factura {order.invoice_id.name}"
+            elif not order.order_line.filtered(lambda l: not l.display_type):
+                skipped[order] = "no tiene líneas para facturar"
+            else:
+                groups[(order.company_id.id, order.partner_id.id, order.currency_id.id)] |= order
+
+        invoices = self.env['account.move'].create([
+            group_orders._prepare_invoice() for group_orders in groups.values()
+        ])
+        invoices.action_post()
+        for group_orders, invoice in zip(groups.values(), invoices):
+            group_orders.invoice_id = invoice
+
+        message = f"Se han creado {len(invoices)} facturas para {sum(len(o) for o in groups.values())} órdenes."
+        if skipped:
+            message += " Órdenes omitidas: " + "; ".join(
+                f"{order.name} ({reason})" for order, reason in skipped.items()
+            )
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Facturación de Reparaciones',
+                'message': message,
+                'type': 'warning' if skipped else 'success',
+                'sticky': bool(skipped),
+                'next': {
+                    'type': 'ir.actions.act_window',
+                    'name': 'Facturas',
+                    'res_model': 'account.move',
+                    'view_mode': 'list,form',
+                    'domain': [('id', 'in', invoices.ids)],
+                    'target': 'current',
+                } if invoices else {'type': 'ir.actions.act_window_close'},
+            },
+        }
+
     def _prepare_invoice(self):
+        """Valores de la factura de una o varias órdenes del mismo cliente y moneda.
+
+        Al consolidar varias órdenes, sus líneas se separan en secciones con el
+        número de cada orden.
+        """
+        first = self[0]
+        invoice_lines = []
+        for order in self:
+            if len(self) > 1:
+                invoice_lines.append((0, 0, {'display_type': 'line_section', 'name': order.name}))
+            invoice_lines += [(0, 0, order._prepare_invoice_line(line))
+                              for line in order.order_line.filtered(lambda l: not l.display_type)]
+        origin = ', '.join(self.mapped('name'))
         return {
             'move_type': 'out_invoice',
-            'partner_id': self.partner_id.id,
-            'currency_id': self.currency_id.id,
-            'ref': self.name,
-            'invoice_origin': self.name,
-            'invoice_line_ids': [(0, 0, self._prepare_invoice_line(line)) 
-                                 for line in self.order_line.filtered(lambda l: not l.display_type)],
+            'partner_id': first.partner_id.id,
+            'currency_id': first.currency_id.id,
+            'company_id': first.company_id.id,
+            'ref': origin,
+            'invoice_origin': origin,
+            'invoice_line_ids': invoice_lines,
         }
 
     def _prepare_invoice_line(self, line):
@@ -424,6 +860,7 @@ class RepairOrder(models.Model):
             'tax_ids': [(6, 0, line.tax_id.ids)],
         }
 
+    @profiled('action')
     def action_view_sale_order(self):
         self.ensure_one()
         return {
@@ -435,6 +872,7 @@ class RepairOrder(models.Model):
             'target': 'current',
         }
 
+    @profiled('action')
     def action_view_invoice(self):
         self.ensure_one()
         return {
@@ -446,18 +884,547 @@ class RepairOrder(models.Model):
             'target': 'current',
         }
 
+    def _get_problem_usage(self):
+        """Cuenta los problemas reportados en las órdenes no canceladas.
+
+        Incluye los problemas archivados, que siguen contando hasta que la
+        orden se cancela o se borra.
+        """
+        usage = Counter()
+        for order in self.with_context(active_test=False):
+            if order.state != 'cancelled':
+                usage.update(order.problem_ids.ids)
+        return usage
+
+    def _update_problem_usage(self, usage_before, usage_after):
+        """Propaga a los problemas la diferencia entre dos recuentos de uso."""
+        delta = Counter(usage_after)
+        delta.subtract(usage_before)
+        self.env['mobile.repair.problem']._apply_usage_delta(delta)
+
     @api.model_create_multi
     def create(self, vals_list):
-        for vals in vals_list:
-            if vals.get('name', 'Nuevo') == 'Nuevo':
-                vals['name'] = self.env['ir.sequence'].next_by_code('mobile.repair.order') or 'Nuevo'
-        return super().create(vals_list)
+        # Un único bloque de números para todas las órdenes del lote
+        pending = [vals for vals in vals_list if vals.get('name', 'Nuevo') == 'Nuevo']
+        names = self.env['ir.sequence'].next_block_by_code('mobile.repair.order', len(pending)) if pending else []
+        for vals, name in zip_longest(pending, names, fillvalue='Nuevo'):
+            vals['name'] = name
+        orders = super().create(vals_list)
+        orders._update_problem_usage(Counter(), orders._get_problem_usage())
+        self.env['mobile.repair.report.problem']._queue_orders(orders.ids)
+        orders._update_sla_status()
+        orders._notify_workbench()
+        return orders
+
+    def write(self, vals):
+        track_usage = 'problem_ids' in vals or 'state' in vals
+        if track_usage:
+            usage_before = self._get_problem_usage()
+        notify_workbench = 'device_id' in vals or WORKBENCH_FIELDS_SET.intersection(vals)
+        if notify_workbench:
+            technicians_before = {order.id: order.technician_id for order in self}
+        audited = self._is_audit_mode() and [fname for fname in AUDIT_TEXT_FIELDS if fname in vals]
+        if audited:
+            texts_before = {order.id: {fname: order[fname] for fname in audited} for order in self}
+        if 'date_received' in vals:
+            # El día que la orden abandona no lo ve el refresco por ``write_date``
+            self.env['mobile.repair.report.daily']._queue_order_days(self.ids)
+        res = super().write(vals)
+        if audited:
+            self._buffer_audit_log(texts_before)
+        if track_usage:
+            self._update_problem_usage(usage_before, self._get_problem_usage())
+        if REPORT_PROBLEM_FIELDS.intersection(vals):
+            self.env['mobile.repair.report.problem']._queue_orders(self.ids)
+        if SLA_TRIGGER_FIELDS.intersection(vals):
+            self._update_sla_status(reassigned='technician_id' in vals)
+        if notify_workbench:
+            self._notify_workbench(
+                technicians_before,
+                notify_self='technician_id' in vals or 'state' in vals,
+            )
+        return res
+
+    def init(self):
+        # Índices parciales limitados a las órdenes vivas: el kanban, las
+        # reglas de registro y los filtros por defecto solo trabajan con ellas.
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS mobile_repair_order_live_state_idx
+                ON mobile_repair_order (state, priority DESC, create_date DESC)
+             WHERE active
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS mobile_repair_order_archivable_idx
+                ON mobile_repair_order (COALESCE(date_delivered, write_date))
+             WHERE active AND state IN ('delivered', 'cancelled')
+        """)
+        # Índices compuestos alineados con ``_order``: la cola de cada técnico
+        # (regla de registro + filtro por estado), la paginación por cursor y
+        # el historial de cada cliente.
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS mobile_repair_order_technician_queue_idx
+                ON mobile_repair_order (technician_id, state, priority DESC, create_date DESC, id DESC)
+             WHERE active
+        """)
+        self.env.cr.execute("DROP INDEX IF EXISTS mobile_repair_order_keyset_idx")
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS mobile_repair_order_keyset_priority_idx
+                ON mobile_repair_order ((COALESCE(priority, 'normal')) DESC, create_date DESC, id DESC)
+             WHERE active
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS mobile_repair_order_partner_received_idx
+                ON mobile_repair_order (partner_id, date_received DESC)
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS mobile_repair_order_sla_idx
+                ON mobile_repair_order (date_promised)
+             WHERE active AND state IN ('draft', 'in_repair')
+        """)
+
+    @api.model
+    def _cron_archive_orders(self, batch_size=ARCHIVE_BATCH_SIZE):
+        """Archiva por bloques las órdenes entregadas o canceladas hace más de N meses.
+
+        Cada bloque se archiva con una escritura, compacta el chatter de sus
+        órdenes y se confirma por separado, de modo que no se mantienen
+        bloqueos largos sobre la tabla de órdenes.
+        """
+        months = int(self.env['ir.config_parameter'].sudo().get_param(ARCHIVE_MONTHS_PARAM, ARCHIVE_DEFAULT_MONTHS))
+        cutoff = fields.Datetime.now() - relativedelta(months=months)
+        self.flush_model(['active', 'state', 'date_delivered'])
+        self.env.cr.execute("""
+            SELECT id FROM mobile_repair_order
+             WHERE active AND state IN ('delivered', 'cancelled')
+               AND COALESCE(date_delivered, write_date) < %s
+          ORDER BY id
+        """, [cutoff])
+        order_ids = [row[0] for row in self.env.cr.fetchall()]
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        for batch_ids in split_every(batch_size, order_ids):
+            orders = self.browse(batch_ids)
+            orders.write({'active': False})
+            orders._compact_chatter()
+            if auto_commit:
+                self.env.cr.commit()
+            self.env.invalidate_all()
+        if order_ids:
+            _logger.info("Archivadas %d órdenes de reparación anteriores a %s", len(order_ids), cutoff)
+        return len(order_ids)
+
+    def _get_sla_limits(self):
+        """Instante actual y límite a partir del cual una orden está en riesgo."""
+        hours = float(self.env['ir.config_parameter'].sudo().get_param(
+            SLA_AT_RISK_HOURS_PARAM, SLA_DEFAULT_AT_RISK_HOURS))
+        now = fields.Datetime.now()
+        return now, now + relativedelta(hours=hours)
+
+    def _update_sla_status(self, reassigned=False):
+        """Reevalúa el plazo de las órdenes tras cambiar su estado o su fecha prometida.
+
+        Con ``reassigned`` también se reaplica el estado de las órdenes en
+        riesgo o vencidas que no cambian, para que su aviso pase al nuevo técnico.
+        """
+        now, risk_limit = self._get_sla_limits()
+        ids_by_status = defaultdict(list)
+        for order in self:
+            if not (order.active and order.state in SLA_OPEN_STATES and order.date_promised):
+                status = False
+            elif order.date_promised < now:
+                status = 'overdue'
+            elif order.date_promised < risk_limit:
+                status = 'at_risk'
+            else:
+                status = 'on_time'
+            if status != order.sla_status or (reassigned and status in SLA_ACTIVITY_SUMMARIES):
+                ids_by_status[status].append(order.id)
+        self._apply_sla_status(ids_by_status)
+
+    @api.model
+    def _cron_update_sla_status(self, batch_size=SLA_BATCH_SIZE):
+        """Marca en bloque las órdenes abiertas que pasan a estar en riesgo o vencidas.
+
+        Una consulta sobre el índice parcial de órdenes abiertas calcula el
+        estado de cada una y devuelve solo las que han cambiado. Se hace una
+        escritura por estado y bloque, y cada bloque se confirma por separado.
+        """
+        now, risk_limit = self._get_sla_limits()
+        self.flush_model(['active', 'state', 'date_promised', 'sla_status'])
+        self.env.cr.execute("""
+            SELECT id, status
+              FROM (
+                    SELECT id, sla_status,
+                           CASE WHEN date_promised < %s THEN 'overdue'
+                                WHEN date_promised < %s THEN 'at_risk'
+                                ELSE 'on_time' END AS status
+                      FROM mobile_repair_order
+                     WHERE active AND state IN ('draft', 'in_repair')
+                       AND date_promised IS NOT NULL
+                   ) orders
+             WHERE sla_status IS DISTINCT FROM status
+          ORDER BY id
+        """, [now, risk_limit])
+        rows = self.env.cr.fetchall()
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        for batch in split_every(batch_size, rows):
+            ids_by_status = defaultdict(list)
+            for order_id, status in batch:
+                ids_by_status[status].append(order_id)
+            self._apply_sla_status(ids_by_status)
+            if auto_commit:
+                self.env.cr.commit()
+            self.env.invalidate_all()
+        if rows:
+            _logger.info("Plazo actualizado en %d órdenes de reparación", len(rows))
+        return len(rows)
+
+    def _apply_sla_status(self, ids_by_status):
+        """Guarda ``{estado: ids}`` y mantiene un único aviso de plazo por orden.
+
+        El estado se escribe con SQL: es un indicador calculado por el
+        planificador y no debe pasar por los ganchos de ``write`` ni cambiar
+        ``write_date`` (del que dependen la caché de reparaciones recientes y
+        el refresco incremental del análisis). Las órdenes que empeoran
+        reutilizan su actividad de plazo abierta, que pasa a su técnico actual,
+        o reciben una nueva; las que vuelven a estar en plazo o se cierran
+        pierden la suya.
+        """
+        ids_by_status = {status: ids for status, ids in ids_by_status.items() if ids}
+        if not ids_by_status:
+            return
+        self.flush_model(['sla_status'])
+        for status, order_ids in ids_by_status.items():
+            self.env.cr.execute(
+                "UPDATE mobile_repair_order SET sla_status = %s WHERE id = ANY(%s)",
+                [status or None, order_ids],
+            )
+        all_ids = [order_id for order_ids in ids_by_status.values() for order_id in order_ids]
+        self.browse(all_ids).invalidate_recordset(['sla_status'])
+
+        activity_type = self.env.ref('mobile_repair_orders.mail_activity_type_sla', raise_if_not_found=False)
+        if not activity_type:
+            return
+        Activity = self.env['mail.activity'].sudo()
+        activity_by_order = {
+            activity.res_id: activity
+            for activity in Activity.search([
+                ('res_model', '=', self._name),
+                ('res_id', 'in', all_ids),
+                ('activity_type_id', '=', activity_type.id),
+            ])
+        }
+        res_model_id = self.env['ir.model']._get_id(self._name)
+        today = fields.Date.context_today(self)
+        obsolete = Activity
+        activity_vals = []
+        for status, order_ids in ids_by_status.items():
+            orders = self.browse(order_ids)
+            if status not in SLA_ACTIVITY_SUMMARIES:
+                obsolete |= Activity.browse([activity_by_order[o.id].id for o in orders if o.id in activity_by_order])
+                continue
+            reused = Activity.browse([activity_by_order[o.id].id for o in orders if o.id in activity_by_order])
+            reused.write({'summary': SLA_ACTIVITY_SUMMARIES[status], 'date_deadline': today})
+            reassigned = defaultdict(lambda: Activity)
+            for order in orders:
+                activity = activity_by_order.get(order.id)
+                if activity and order.technician_id and activity.user_id != order.technician_id:
+                    reassigned[order.technician_id.id] |= activity
+            for technician_id, activities in reassigned.items():
+                activities.write({'user_id': technician_id})
+            activity_vals += [{
+                'res_model_id': res_model_id,
+                'res_id': order.id,
+                'activity_type_id': activity_type.id,
+                'summary': SLA_ACTIVITY_SUMMARIES[status],
+                'date_deadline': today,
+                'user_id': order.technician_id.id,
+            } for order in orders if order.technician_id and order.id not in activity_by_order]
+        if obsolete:
+            obsolete.unlink()
+        if activity_vals:
+            Activity.create(activity_vals)
+
+    def _compact_chatter(self):
+        """Elimina el seguimiento de cambios y las notificaciones vacías del chatter.
+
+        Se conservan los mensajes con contenido (comentarios, notas y correos);
+        solo desaparecen los valores de seguimiento y los avisos automáticos
+        que quedan sin cuerpo.
+        """
+        if not self.ids:
+            return
+        self.env['mail.message'].flush_model()
+        self.env.cr.execute("""
+            DELETE FROM mail_tracking_value
+             WHERE mail_message_id IN (
+                    SELECT id FROM mail_message
+                     WHERE model = %s AND res_id = ANY(%s)
+                   )
+        """, [self._name, self.ids])
+        self.env.cr.execute("""
+            DELETE FROM mail_message message
+             WHERE message.model = %s AND message.res_id = ANY(%s)
+               AND message.message_type = 'notification'
+               AND (message.body IS NULL OR message.body = '')
+               AND NOT EXISTS (
+                    SELECT 1 FROM message_attachment_rel rel WHERE rel.message_id = message.id
+                   )
+        """, [self._name, self.ids])
+        self.env['mail.message'].invalidate_model()
+        self.env['mail.tracking.value'].invalidate_model()
+
+    @api.model
+    def _search_keyset(self, domain=None, cursor=None, limit=80, fields=None):
+        """Página de órdenes en el orden de ``_order`` sin OFFSET.
+
+        Las órdenes se ordenan por (prioridad, fecha de creación, id)
+        descendentes y la página siguiente empieza tras la última fila de la
+        anterior con una comparación de filas, así que cualquier página cuesta
+        lo mismo que la primera. Una prioridad vacía cuenta como ``normal``:
+        con NULL la comparación de filas no es cierta y esas órdenes se
+        saltarían. ``cursor`` es el valor opaco devuelto en ``next_cursor`` y
+        solo es válido para el mismo dominio.
+        """
+        limit = max(1, min(int(limit), KEYSET_MAX_LIMIT))
+        query = self._search(domain or [])
+        priority = SQL("COALESCE(%s, 'normal')", SQL.identifier(self._table, 'priority'))
+        create_date, order_id = (SQL.identifier(self._table, fname) for fname in ('create_date', 'id'))
+        if cursor:
+            query.add_where(SQL(
+                "(%s, %s, %s) < (%s, %s::timestamp, %s)",
+                priority, create_date, order_id, *self._decode_keyset_cursor(cursor),
+            ))
+        query.order = SQL("%s DESC, %s DESC, %s DESC", priority, create_date, order_id)
+        query.limit = limit + 1
+        self.env.cr.execute(query.select(order_id, priority, create_date))
+        rows = self.env.cr.fetchall()
+        page = rows[:limit]
+        return {
+            'records': self.browse([row[0] for row in page]).read(fields or KEYSET_DEFAULT_FIELDS),
+            'next_cursor': self._encode_keyset_cursor(page[-1]) if len(rows) > limit else False,
+        }
+
+    @api.model
+    def _encode_keyset_cursor(self, row):
+        order_id, priority, create_date = row
+        payload = json.dumps([priority, create_date.isoformat(), order_id])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    @api.model
+    def _decode_keyset_cursor(self, cursor):
+        try:
+            priority, create_date, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return priority, datetime.fromisoformat(create_date), int(order_id)
+        except (ValueError, TypeError, binascii.Error):
+            raise UserError("El cursor de paginación no es válido.")
+
+    @api.model
+    def _get_customer_stats(self, partner_ids, recent_limit=5):
+        """Estadísticas de reparaciones por cliente con una agregación agrupada.
+
+        Devuelve un diccionario ``{partner_id: stats}`` con los totales por
+        estado y las ``recent_limit`` órdenes más recientes de cada cliente.
+        Se respetan las reglas de acceso del usuario actual.
+        """
+        partner_ids = [pid for pid in partner_ids if pid]
+        stats = {
+            pid: {
+                'total_repairs': 0,
+                'completed_repairs': 0,
+                'pending_repairs': 0,
+                'recent_repairs': [],
+            }
+            for pid in partner_ids
+        }
+        if not partner_ids:
+            return stats
+
+        domain = [('partner_id', 'in', partner_ids)]
+        # Las órdenes archivadas siguen contando en el historial del cliente
+        self = self.with_context(active_test=False)
+        groups = self.read_group(domain, ['partner_id', 'state'], ['partner_id', 'state'], lazy=False)
+        for group in groups:
+            partner_stats = stats[group['partner_id'][0]]
+            partner_stats['total_repairs'] += group['__count']
+            if group['state'] in ('repaired', 'delivered'):
+                partner_stats['completed_repairs'] += group['__count']
+            elif group['state'] in ('draft', 'in_repair'):
+                partner_stats['pending_repairs'] += group['__count']
+
+        # Últimas órdenes por cliente en una sola consulta con ventana
+        query = self._search(domain)
+        self.env.cr.execute(SQL(
+            """
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY partner_id ORDER BY date_received DESC, id DESC
+                ) AS rank
+                FROM mobile_repair_order
+                WHERE id IN %s
+            ) ranked
+            WHERE rank <= %s
+            """,
+            query.subselect(),
+            recent_limit,
+        ))
+        recent_ids = [row[0] for row in self.env.cr.fetchall()]
+        if not recent_ids:
+            return stats
+
+        state_labels = dict(self._fields['state']._description_selection(self.env))
+        recent_orders = self.browse(recent_ids).read(
+            ['partner_id', 'name', 'device_info', 'state', 'date_received', 'problem_description'],
+            load=None,
+        )
+        recent_orders.sort(key=lambda o: (o['date_received'] or datetime.min, o['id']), reverse=True)
+        for order in recent_orders:
+            description = order['problem_description'] or ''
+            stats[order['partner_id']]['recent_repairs'].append({
+                'id': order['id'],
+                'name': order['name'],
+                'device_info': order['device_info'],
+                'state': order['state'],
+                'state_label': state_labels.get(order['state'], order['state']),
+                'date_received': order['date_received'].strftime('%d/%m/%Y') if order['date_received'] else '',
+                'problem_description': description[:100] + '...' if len(description) > 100 else description,
+            })
+        return stats
+
+    @api.model
+    def _is_audit_mode(self):
+        return str2bool(self.env['ir.config_parameter'].sudo().get_param(AUDIT_MODE_PARAM, 'False'))
+
+    def _track_get_fields(self):
+        tracked_fields = super()._track_get_fields()
+        if self._is_audit_mode():
+            tracked_fields = tracked_fields - set(AUDIT_TEXT_FIELDS)
+        return tracked_fields
+
+    def _buffer_audit_log(self, texts_before):
+        """Acumula los cambios de texto en el búfer de la transacción.
+
+        El búfer se vuelca al diario con un único ``create`` antes del commit.
+        """
+        AuditLog = self.env['mobile.repair.audit.log']
+        precommit = self.env.cr.precommit
+        if AUDIT_BUFFER_KEY not in precommit.data:
+            precommit.data[AUDIT_BUFFER_KEY] = []
+            precommit.add(self._flush_audit_log)
+        buffer = precommit.data[AUDIT_BUFFER_KEY]
+        now = fields.Datetime.now()
+        for order in self:
+            for fname, old in texts_before[order.id].items():
+                new = order[fname]
+                if (old or '') == (new or ''):
+                    continue
+                buffer.append({
+                    'order_id': order.id,
+                    'user_id': self.env.uid,
+                    'date': now,
+                    'field_name': fname,
+                    'field_label': self._fields[fname].string,
+                    'diff': AuditLog._text_diff(old, new),
+                })
+
+    def _flush_audit_log(self):
+        vals_list = self.env.cr.precommit.data.pop(AUDIT_BUFFER_KEY, [])
+        if vals_list:
+            AuditLog = self.env['mobile.repair.audit.log'].sudo()
+            AuditLog.create(vals_list)
+            AuditLog.flush_model()
+
+    @api.model
+    def _get_workbench_snapshot(self):
+        """Cola compacta de órdenes abiertas del técnico actual."""
+        return self.search_read(
+            [('technician_id', '=', self.env.uid), ('state', 'in', WORKBENCH_STATES)],
+            WORKBENCH_FIELDS,
+        )
+
+    def _notify_workbench(self, technicians_before=None, notify_self=True):
+        """Envía por el bus los cambios de las órdenes a los técnicos afectados.
+
+        Cada técnico recibe un único mensaje con las tarjetas a actualizar y las
+        que salen de su cola (reasignadas o cerradas). Sin ``notify_self`` no se
+        avisa al técnico que hace la modificación, que ya ve sus propios cambios.
+        """
+        technicians_before = technicians_before or {}
+        payloads = defaultdict(lambda: {'upsert': [], 'remove': []})
+        orders = self.sudo()
+        values = {vals['id']: vals for vals in orders.read(WORKBENCH_FIELDS)}
+        for order in orders:
+            previous = technicians_before.get(order.id)
+            if previous and previous != order.technician_id:
+                payloads[previous]['remove'].append(order.id)
+            technician = order.technician_id
+            if not technician or (not notify_self and technician.id == self.env.uid):
+                continue
+            if order.state in WORKBENCH_STATES:
+                payloads[technician]['upsert'].append(values[order.id])
+            else:
+                payloads[technician]['remove'].append(order.id)
+        if payloads:
+            self.env['bus.bus']._sendmany([
+                (technician.partner_id, WORKBENCH_NOTIFICATION, payload)
+                for technician, payload in payloads.items()
+            ])
+
+    @api.model
+    def _get_recent_repairs_stamp(self, partner_id):
+        """Versión de las órdenes de un cliente para la caché del widget.
+
+        Cambia con cada alta, modificación o borrado de sus órdenes: la fecha
+        de escritura más reciente cubre altas y modificaciones y el número de
+        órdenes cubre los borrados. ``device_info`` se recalcula al renombrar
+        un dispositivo, su modelo o su marca sin tocar la fecha de escritura
+        de la orden, así que entra en la versión por su contenido.
+        """
+        self.flush_model(['partner_id', 'device_info'])
+        self.env.cr.execute("""
+            SELECT MAX(write_date), COUNT(*), md5(string_agg(COALESCE(device_info, ''), '|' ORDER BY id))
+              FROM mobile_repair_order
+             WHERE partner_id = %s
+        """, [partner_id])
+        last_write, count, devices = self.env.cr.fetchone()
+        return '%s/%s/%s' % (last_write.isoformat() if last_write else '', count, devices or '')
+
+    @api.model
+    def _get_recent_repairs_etag(self, partner_id, stamp):
+        key = '%s/%s/%s/%s/%s' % (partner_id, stamp, self.env.lang, self.env.uid, self.env.companies.ids)
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    @api.model
+    @tools.ormcache('partner_id', 'stamp', 'self.env.lang', 'self.env.uid', 'tuple(self.env.companies.ids)')
+    def _render_recent_repairs_html(self, partner_id, stamp):
+        """Renderiza el widget de reparaciones recientes de un cliente.
+
+        El resultado se cachea por cliente, idioma, usuario y compañías
+        permitidas (las reglas de registro dependen de ellos) y versión de sus
+        órdenes.
+        """
+        orders = self.with_context(active_test=False).search(
+            [('partner_id', '=', partner_id)], order='date_received desc', limit=5
+        )
+        return str(self.env['ir.qweb']._render('mobile_repair_orders.recent_repairs_widget', {
+            'orders': orders,
+            'state_colors': RECENT_REPAIRS_STATE_COLORS,
+            'state_icons': RECENT_REPAIRS_STATE_ICONS,
+            'state_labels': RECENT_REPAIRS_STATE_LABELS,
+        }))
 
     def unlink(self):
         for order in self:
             if order.state != 'cancelled':
                 raise UserError("No se puede eliminar una orden de reparación que no esté en estado 'Cancelado'.")
-        return super().unlink()
+        usage_before = self._get_problem_usage()
+        self.env['mobile.repair.report.daily']._queue_order_days(self.ids)
+        res = super().unlink()
+        self._update_problem_usage(usage_before, Counter())
+        return res
+
+class StockMove(models.Model):
+    _inherit = 'stock.move'
+    repair_order_id = fields.Many2one('mobile.repair.order', string='Orden de Reparación', readonly=True, copy=False, index='btree_not_null')
 
 class SaleOrder(models.Model):
     _inherit = 'sale.order'
@@ -466,13 +1433,93 @@ class SaleOrder(models.Model):
 class ResPartner(models.Model):
     _inherit = 'res.partner'
     repair_orders_count = fields.Integer(string='Órdenes de Reparación', compute='_compute_repair_orders_count')
+    search_text = fields.Char(
+        string='Texto de Búsqueda', compute='_compute_search_text', store=True, index='trigram',
+        help="Nombre, referencia, teléfonos y email normalizados para la búsqueda de mostrador."
+    )
+
+    phone_key = fields.Char(
+        string='Clave Teléfono', compute='_compute_phone_keys', store=True, index=True,
+        help="Teléfono normalizado al estilo E.164 para identificar llamadas entrantes."
+    )
+    mobile_key = fields.Char(
+        string='Clave Móvil', compute='_compute_phone_keys', store=True, index=True,
+        help="Móvil normalizado al estilo E.164 para identificar llamadas entrantes."
+    )
+
+    @api.depends('phone', 'mobile', 'country_id', 'company_id.country_id')
+    @profiled('compute')
+    def _compute_phone_keys(self):
+        """Normaliza teléfono y móvil para identificar llamadas entrantes.
+
+        Sin país propio se usa el de la compañía del contacto o, si no tiene,
+        el de la compañía principal. Nunca el de la compañía activa del
+        usuario, para que la clave no dependa de quién guarda el contacto.
+        """
+        main_company = self.env.ref('base.main_company', raise_if_not_found=False)
+        default_country = main_company.sudo().country_id if main_company else self.env['res.country']
+        for partner in self:
+            country = partner.country_id or partner.company_id.sudo().country_id or default_country
+            partner.phone_key = normalize_phone_key(partner.phone, country)
+            partner.mobile_key = normalize_phone_key(partner.mobile, country)
+
+    @api.model
+    def _get_caller_card(self, number, limit=5):
+        """Ficha del llamante a partir del número tal y como llega en la llamada.
+
+        Devuelve los clientes con ese teléfono o móvil, sus reparaciones
+        abiertas y sus últimos dispositivos, con una consulta por bloque. Las
+        reparaciones abiertas se buscan también por la copia indexada del
+        teléfono en la orden, así que aparecen aunque el cliente quede fuera
+        de los ``limit`` primeros.
+        """
+        key = normalize_phone_key(number, self.env.company.country_id)
+        if not key:
+            return {'partners': [], 'open_repairs': [], 'devices': []}
+        partners = self.search(['|', ('phone_key', '=', key), ('mobile_key', '=', key)], limit=limit)
+        if not partners:
+            return {'partners': [], 'open_repairs': [], 'devices': []}
+
+        RepairOrder = self.env['mobile.repair.order'].with_context(active_test=False)
+        open_repairs = RepairOrder.search_read(
+            [
+                '|', ('partner_phone_key', '=', key), ('partner_id', 'in', partners.ids),
+                ('state', 'in', ['draft', 'in_repair', 'repaired']),
+            ],
+            ['name', 'partner_id', 'device_info', 'state', 'priority', 'date_received', 'date_promised', 'technician_id'],
+            order='date_received desc',
+        )
+        devices = RepairOrder._read_group(
+            [('partner_id', 'in', partners.ids)],
+            ['device_id'],
+            ['date_received:max'],
+            order='date_received:max desc',
+            limit=limit,
+        )
+        return {
+            'partners': partners.read(['name', 'phone', 'mobile', 'email', 'repair_orders_count']),
+            'open_repairs': open_repairs,
+            'devices': [
+                {'id': device.id, 'name': device.display_name, 'last_repair_date': last_date}
+                for device, last_date in devices
+            ],
+        }
+
+    @api.depends('name', 'ref', 'phone', 'mobile', 'email')
+    @profiled('compute')
+    def _compute_search_text(self):
+        for partner in self:
+            partner.search_text = normalize_search_text(
+                partner.name, partner.ref, partner.phone, partner.mobile, partner.email,
+            )
     
+    @profiled('compute')
     def _compute_repair_orders_count(self):
         """Calcula el número de reparaciones por cliente de forma optimizada."""
         if not self.ids:
             self.repair_orders_count = 0
             return
-        repair_data = self.env['mobile.repair.order'].read_group(
+        repair_data = self.env['mobile.repair.order'].with_context(active_test=False).read_group(
             [('partner_id', 'in', self.ids)],
             ['partner_id'],
             ['partner_id']
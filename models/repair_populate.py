@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import random
+from datetime import date, datetime, timedelta
+
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+from .repair_search import normalize_phone_key, normalize_search_text
+
+_logger = logging.getLogger(__name__)
+
+POPULATE_BRANDS = [
+    'Apple', 'Samsung', 'Xiaomi', 'Huawei', 'Motorola', 'OPPO', 'Realme', 'Google',
+    'OnePlus', 'Sony', 'Nokia', 'Vivo', 'Honor', 'ZTE', 'Alcatel', 'TCL',
+]
+POPULATE_CATEGORIES = ['Pantalla', 'Batería', 'Carga', 'Audio', 'Software', 'Cámara', 'Placa', 'Botones']
+POPULATE_PROBLEMS = ['No funciona', 'Funciona a ratos', 'Dañado por golpe', 'Dañado por líquido', 'Desgaste', 'Ruido']
+POPULATE_FIRST_NAMES = [
+    'Ana', 'Luis', 'María', 'José', 'Carmen', 'Antonio', 'Laura', 'Manuel', 'Lucía', 'Javier',
+    'Elena', 'David', 'Paula', 'Carlos', 'Sara', 'Miguel', 'Marta', 'Pablo', 'Julia', 'Raúl',
+]
+POPULATE_LAST_NAMES = [
+    'García', 'Rodríguez', 'González', 'Fernández', 'López', 'Martínez', 'Sánchez', 'Pérez',
+    'Gómez', 'Martín', 'Jiménez', 'Ruiz', 'Hernández', 'Díaz', 'Moreno', 'Álvarez',
+]
+POPULATE_DESCRIPTIONS = [
+    'La pantalla no responde al tacto', 'Se apaga con un 30% de batería', 'No carga con ningún cable',
+    'No se oye al otro interlocutor', 'Se reinicia al abrir la cámara', 'Cayó al agua ayer',
+    'El botón de encendido está hundido', 'Líneas verdes en la pantalla', 'Se calienta mucho al cargar',
+]
+# Reparto de estados según la antigüedad de la orden: las antiguas están casi
+# todas cerradas y las del último mes repartidas por todo el flujo
+POPULATE_STATES = ['draft', 'in_repair', 'repaired', 'delivered', 'cancelled']
+POPULATE_STATE_WEIGHTS_OLD = [1, 2, 4, 85, 8]
+POPULATE_STATE_WEIGHTS_RECENT = [30, 35, 18, 14, 3]
+POPULATE_PRIORITIES = ['normal', 'high', 'urgent']
+POPULATE_PRIORITY_WEIGHTS = [80, 15, 5]
+POPULATE_PROGRESS = {'draft': 0, 'in_repair': 50, 'repaired': 75, 'delivered': 100, 'cancelled': 0}
+POPULATE_TAX_RATE = 21.0
+
+
+def imei_check_digit(body):
+    """Dígito de control Luhn de los 14 primeros dígitos de un IMEI."""
+    total = 0
+    for position, char in enumerate(reversed(body)):
+        digit = int(char)
+        if position % 2 == 0:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return str((10 - total % 10) % 10)
+
+
+class RepairPopulate(models.AbstractModel):
+    """Generador de datos sintéticos para pruebas de carga.
+
+    Los catálogos (marcas, modelos, problemas, productos, clientes y técnicos)
+    se crean con el ORM. Dispositivos, órdenes y líneas se insertan con SQL en
+    bloques, con sus campos calculados ya resueltos, y al terminar se
+    reconstruyen contadores e informes con los métodos de mantenimiento del
+    módulo. La misma semilla y los mismos tamaños producen los mismos datos.
+
+    Se usa desde la línea de comandos::
+
+        odoo-bin repair_populate -d db --orders 1000000 --seed 42
+    """
+    _name = 'mobile.repair.populate'
+    _description = 'Generador de Datos de Carga'
+
+    @api.model
+    def _generate(self, orders=1000, partners=None, devices=None, brands=10, models_per_brand=12,
+                  technicians=10, products=40, years=3, seed=42, batch_size=10000):
+        """Genera el conjunto de datos y devuelve el número de registros por modelo."""
+        if orders <= 0:
+            raise UserError("El número de órdenes debe ser positivo.")
+        partners = partners or max(1, orders // 4)
+        devices = devices or max(1, orders // 2)
+        rng = random.Random(seed)
+        now = fields.Datetime.now()
+        company = self.env.company
+
+        catalog = self._populate_catalog(rng, brands, models_per_brand, products)
+        technician_ids = self._populate_technicians(technicians)
+        partner_rows = self._populate_partners(rng, partners, batch_size)
+        device_rows = self._populate_devices(rng, catalog['models'], partner_rows, devices, seed, batch_size)
+        order_count = self._populate_orders(
+            rng, catalog, technician_ids, device_rows, orders, years, now, company, batch_size,
+        )
+        self._populate_finalize()
+        return {
+            'mobile.repair.device.model': len(catalog['models']),
+            'mobile.repair.problem': len(catalog['problems']),
+            'res.partner': len(partner_rows),
+            'mobile.repair.device': len(device_rows),
+            'mobile.repair.order': order_count,
+        }
+
+    # --- CATÁLOGOS (ORM) ---
+
+    def _populate_catalog(self, rng, brand_count, models_per_brand, product_count):
+        Brand = self.env['mobile.repair.device.brand']
+        brand_names = [
+            POPULATE_BRANDS[i] if i < len(POPULATE_BRANDS) else f'Marca {i + 1}'
+            for i in range(brand_count)
+        ]
+        existing = {brand.name: brand for brand in Brand.search([('name', 'in', brand_names)])}
+        brands = Brand.browse([existing[name].id for name in brand_names if name in existing])
+        brands |= Brand.create([{'name': name} for name in brand_names if name not in existing])
+
+        device_models = self.env['mobile.repair.device.model'].create([
+            {
+                'name': f'Carga {rng.randint(1, 99)}{chr(65 + index % 26)}-{index}',
+                'brand_id': brand.id,
+                'release_year': rng.randint(2015, date.today().year),
+            }
+            for brand in brands for index in range(models_per_brand)
+        ])
+
+        categories = self.env['mobile.repair.problem.category'].create([
+            {'name': f'{name} (carga)', 'sequence': 10 * (index + 1)}
+            for index, name in enumerate(POPULATE_CATEGORIES)
+        ])
+        problems = self.env['mobile.repair.problem'].create([
+            {'name': f'{category.name}: {problem}', 'category_id': category.id}
+            for category in categories for problem in POPULATE_PROBLEMS
+        ])
+
+        tax = self.env['account.tax'].search([
+            ('type_tax_use', '=', 'sale'), ('amount_type', '=', 'percent'),
+            ('amount', '=', POPULATE_TAX_RATE), ('price_include', '=', False),
+            ('company_id', '=', self.env.company.id),
+        ], limit=1) or self.env['account.tax'].create({
+            'name': f'IVA {POPULATE_TAX_RATE:g}% (carga)',
+            'amount': POPULATE_TAX_RATE,
+            'amount_type': 'percent',
+            'type_tax_use': 'sale',
+        })
+        product_list = self.env['product.product'].create([
+            {
+                'name': f'Mano de obra nivel {index + 1}' if index < 4 else f'Repuesto de carga {index - 3}',
+                'type': 'service' if index < 4 else 'consu',
+                'is_storable': index >= 4,
+                'list_price': round(rng.uniform(15, 60) if index < 4 else rng.uniform(10, 250), 2),
+                'standard_price': round(rng.uniform(5, 20) if index < 4 else rng.uniform(5, 150), 2),
+                'taxes_id': [(6, 0, tax.ids)],
+            }
+            for index in range(max(product_count, 5))
+        ])
+        return {
+            'models': [(model.id, model.brand_id.id, model.display_name) for model in device_models],
+            'problems': [(problem.id, problem.category_id.id) for problem in problems],
+            'products': [
+                (product.id, product.display_name, product.uom_id.id, product.list_price, product.standard_price)
+                for product in product_list
+            ],
+            'tax': tax,
+        }
+
+    def _populate_technicians(self, count):
+        group = self.env.ref('mobile_repair_orders.group_mobile_repair_user')
+        Users = self.env['res.users'].with_context(no_reset_password=True)
+        logins = [f'tecnico.carga.{index + 1}' for index in range(count)]
+        existing = Users.search([('login', 'in', logins)])
+        missing = [login for login in logins if login not in existing.mapped('login')]
+        users = existing | Users.create([
+            {'name': f'Técnico de Carga {login.rsplit(".", 1)[1]}', 'login': login, 'groups_id': [(4, group.id)]}
+            for login in missing
+        ])
+        return users.ids
+
+    def _populate_partners(self, rng, count, batch_size):
+        """Crea los clientes por bloques y devuelve sus datos desnormalizados."""
+        Partner = self.env['res.partner'].with_context(tracking_disable=True, mail_create_nolog=True)
+        rows = []
+        for offset in range(0, count, batch_size):
+            vals_list = []
+            for index in range(offset, min(offset + batch_size, count)):
+                name = f'{rng.choice(POPULATE_FIRST_NAMES)} {rng.choice(POPULATE_LAST_NAMES)} {rng.choice(POPULATE_LAST_NAMES)}'
+                vals_list.append({
+                    'name': name,
+                    'phone': f'6{rng.randint(0, 99999999):08d}',
+                    'email': f'cliente.carga.{index + 1}@example.com',
+                })
+            for partner in Partner.create(vals_list):
+                rows.append((partner.id, partner.name, partner.phone, partner.email, partner.phone_key))
+            self.env.flush_all()
+            self.env.invalidate_all()
+        return rows
+
+    # --- DISPOSITIVOS Y ÓRDENES (SQL EN BLOQUE) ---
+
+    def _populate_devices(self, rng, device_models, partner_rows, count, seed, batch_size):
+        """Inserta los dispositivos con IMEI válidos y únicos.
+
+        Los IMEI son consecutivos a partir de un inicio derivado de la
+        semilla, así que son únicos por construcción; si el rango ya está en
+        uso se pide otra semilla. Devuelve ``(id, propietario, info, código, imei)``.
+        """
+        first_serial = random.Random(seed).randrange(10 ** 11) * 10
+        bounds = [
+            body + imei_check_digit(body)
+            for body in ('35%012d' % first_serial, '35%012d' % (first_serial + count - 1))
+        ]
+        self.env.cr.execute(
+            "SELECT 1 FROM mobile_repair_device WHERE imei BETWEEN %s AND %s LIMIT 1", bounds,
+        )
+        if self.env.cr.fetchone():
+            raise UserError("Los IMEI de esta semilla ya existen en la base de datos. Use otra semilla.")
+
+        codes = self.env['ir.sequence'].next_block_by_code('mobile.repair.device', count)
+        ids = self._populate_reserve_ids('mobile_repair_device', count)
+        rows = []
+        now = fields.Datetime.now()
+        uid = self.env.uid
+        for offset in range(0, count, batch_size):
+            values = []
+            for index in range(offset, min(offset + batch_size, count)):
+                model_id, brand_id, model_name = rng.choice(device_models)
+                body = '35%012d' % (first_serial + index)
+                imei = body + imei_check_digit(body)
+                display_name = f'[{codes[index]}] {model_name}'
+                values.append((
+                    ids[index], brand_id, model_id, imei, codes[index], rng.random() > 0.1,
+                    rng.choice(['good', 'good', 'good', 'scratches', 'screen_broken', 'dents', 'screen_lines']),
+                    rng.choice(['none', 'pin', 'pattern', 'password']),
+                    display_name, normalize_search_text(display_name, imei), 0, uid, now, uid, now,
+                ))
+                rows.append((ids[index], rng.choice(partner_rows), display_name, codes[index], imei))
+            self._populate_insert('mobile_repair_device', [
+                'id', 'brand_id', 'model_id', 'imei', 'device_code', 'powers_on', 'physical_state',
+                'lock_type', 'display_name', 'search_text', 'repair_count',
+                'create_uid', 'create_date', 'write_uid', 'write_date',
+            ], values)
+        return rows
+
+    def _populate_orders(self, rng, catalog, technician_ids, device_rows, count, years, now, company, batch_size):
+        """Inserta órdenes, líneas, problemas e impuestos con sus importes resueltos.
+
+        Las fechas se reparten por los últimos ``years`` años y el estado
+        depende de la antigüedad. Los números de orden se reservan en bloque
+        por año de recepción con la secuencia del módulo.
+        """
+        currency = company.currency_id
+        location = self.env['stock.warehouse'].search([('company_id', '=', company.id)], limit=1).lot_stock_id
+        if not location:
+            raise UserError("La compañía necesita un almacén para generar órdenes.")
+        CommissionRule = self.env['mobile.repair.commission.rule']
+        commission_table = CommissionRule._get_commission_table()
+        problems = catalog['problems']
+        services = catalog['products'][:4]
+        parts = catalog['products'][4:]
+        tax_rate = catalog['tax'].amount / 100.0
+        span = timedelta(days=365 * years).total_seconds()
+        uid = self.env.uid
+
+        order_model = self.env['mobile.repair.order']
+        line_model = self.env['mobile.repair.order.line']
+        problem_field = order_model._fields['problem_ids']
+        tax_field = line_model._fields['tax_id']
+
+        # Fechas de recepción ordenadas para numerar las órdenes por año
+        received = sorted(now - timedelta(seconds=rng.random() * span) for _ in range(count))
+        names = []
+        for year in sorted({day.year for day in received}):
+            year_count = sum(1 for day in received if day.year == year)
+            names += self.env['ir.sequence'].with_context(
+                ir_sequence_date=fields.Date.to_string(date(year, 1, 1)),
+            ).next_block_by_code('mobile.repair.order', year_count)
+        order_ids = self._populate_reserve_ids('mobile_repair_order', count)
+
+        for offset in range(0, count, batch_size):
+            order_values, line_values, problem_values, tax_values = [], [], [], []
+            batch_end = min(offset + batch_size, count)
+            line_count = 0
+            for index in range(offset, batch_end):
+                date_received = received[index]
+                recent = (now - date_received).days < 30
+                state = rng.choices(
+                    POPULATE_STATES,
+                    POPULATE_STATE_WEIGHTS_RECENT if recent else POPULATE_STATE_WEIGHTS_OLD,
+                )[0]
+                date_started = date_completed = date_delivered = None
+                if state in ('in_repair', 'repaired', 'delivered'):
+                    date_started = min(date_received + timedelta(hours=rng.uniform(0, 48)), now)
+                if state in ('repaired', 'delivered'):
+                    date_completed = min(date_started + timedelta(hours=rng.uniform(1, 72)), now)
+                if state == 'delivered':
+                    date_delivered = min(date_completed + timedelta(days=rng.uniform(0, 7)), now)
+                repair_time = 0.0
+                if date_started and date_completed:
+                    repair_time = (date_completed - date_started).total_seconds() / 86400.0
+
+                device_id, partner, device_info, device_code, imei = rng.choice(device_rows)
+                partner_id, partner_name, phone, email, phone_key = partner
+                order_problems = rng.sample(problems, rng.choice([1, 1, 1, 2]))
+                technician_id = rng.choice(technician_ids) if technician_ids and state != 'draft' else None
+                description = rng.choice(POPULATE_DESCRIPTIONS)
+
+                amount_untaxed = amount_total = total_cost = 0.0
+                order_lines = [rng.choice(services)] + rng.sample(parts, rng.randint(0, 2))
+                for sequence, (product_id, product_name, uom_id, list_price, standard_price) in enumerate(order_lines):
+                    qty = 1.0
+                    subtotal = currency.round(list_price * qty)
+                    total = currency.round(subtotal * (1 + tax_rate))
+                    amount_untaxed += subtotal
+                    amount_total += total
+                    total_cost += standard_price * qty
+                    line_values.append([
+                        order_ids[index], (sequence + 1) * 10, product_id, product_name, qty, uom_id,
+                        list_price, standard_price, 0.0, currency.id, subtotal, total,
+                        uid, date_received, uid, date_received,
+                    ])
+                    line_count += 1
+
+                commission = 0.0
+                if technician_id and amount_total > 0:
+                    rate = CommissionRule._get_commission_rate(
+                        commission_table, technician_id, list({category for _, category in order_problems}),
+                    )
+                    commission = amount_total * rate
+                name = names[index]
+                order_values.append((
+                    order_ids[index], name, True, partner_id, device_id, phone, email, phone_key,
+                    state, rng.choices(POPULATE_PRIORITIES, POPULATE_PRIORITY_WEIGHTS)[0], 0, technician_id,
+                    description, date_received, date_received + timedelta(days=rng.randint(1, 10)),
+                    date_started, date_completed, date_delivered, device_info, currency.id, company.id,
+                    location.id, amount_untaxed, amount_total - amount_untaxed, amount_total,
+                    amount_total - total_cost if amount_total else 0.0, commission, repair_time,
+                    len(order_problems), POPULATE_PROGRESS[state], False,
+                    normalize_search_text(name, partner_name, phone, email, imei, device_code, description),
+                    uid, date_received, uid, date_delivered or date_completed or date_started or date_received,
+                ))
+                problem_values += [(order_ids[index], problem_id) for problem_id, _ in order_problems]
+
+            self._populate_insert('mobile_repair_order', [
+                'id', 'name', 'active', 'partner_id', 'device_id', 'partner_phone', 'partner_email',
+                'partner_phone_key', 'state', 'priority', 'color', 'technician_id', 'problem_description',
+                'date_received', 'date_promised', 'date_started', 'date_completed', 'date_delivered',
+                'device_info', 'currency_id', 'company_id', 'location_id', 'amount_untaxed', 'amount_tax',
+                'amount_total', 'margin', 'commission_amount', 'repair_time', 'problem_count',
+                'progress_percentage', 'invoiced', 'search_text',
+                'create_uid', 'create_date', 'write_uid', 'write_date',
+            ], order_values)
+            self._populate_insert(problem_field.relation, [problem_field.column1, problem_field.column2], problem_values)
+
+            line_ids = self._populate_reserve_ids('mobile_repair_order_line', line_count)
+            for line_id, values in zip(line_ids, line_values):
+                values.insert(0, line_id)
+                tax_values.append((line_id, catalog['tax'].id))
+            self._populate_insert('mobile_repair_order_line', [
+                'id', 'repair_order_id', 'sequence', 'product_id', 'name', 'product_uom_qty', 'product_uom',
+                'price_unit', 'cost_price', 'discount', 'currency_id', 'price_subtotal', 'price_total',
+                'create_uid', 'create_date', 'write_uid', 'write_date',
+            ], line_values)
+            self._populate_insert(tax_field.relation, [tax_field.column1, tax_field.column2], tax_values)
+            _logger.info("Órdenes de carga generadas: %d/%d", batch_end, count)
+        return count
+
+    def _populate_finalize(self):
+        """Reconstruye contadores, estadísticas e informes tras la carga."""
+        self.env.cr.execute("""
+            UPDATE mobile_repair_device device
+               SET repair_count = stats.repair_count,
+                   last_repair_date = stats.last_repair_date
+              FROM (
+                    SELECT device_id, COUNT(*) AS repair_count, MAX(date_received) AS last_repair_date
+                      FROM mobile_repair_order
+                  GROUP BY device_id
+                   ) stats
+             WHERE stats.device_id = device.id
+        """)
+        self.env.invalidate_all()
+        self.env['mobile.repair.problem']._recompute_usage_count()
+        self.env['mobile.repair.report.daily']._refresh(full=True)
+        self.env['mobile.repair.report.problem']._sync_orders()
+        self.env.cr.execute("ANALYZE mobile_repair_order")
+        self.env.cr.execute("ANALYZE mobile_repair_order_line")
+        self.env.cr.execute("ANALYZE mobile_repair_device")
+
+    # --- UTILIDADES SQL ---
+
+    def _populate_reserve_ids(self, table, count):
+        """Reserva ``count`` ids de la secuencia de la tabla para enlazar filas antes de insertarlas."""
+        if count <= 0:
+            return []
+        self.env.cr.execute(SQL(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)", table, count,
+        ))
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    def _populate_insert(self, table, columns, rows):
+        """Inserta ``rows`` en ``table`` con una sentencia por bloque de mil filas."""
+        for start in range(0, len(rows), 1000):
+            self.env.cr.execute(SQL(
+                "INSERT INTO %s (%s) VALUES %s",
+                SQL.identifier(table),
+                SQL(", ").join(SQL.identifier(column) for column in columns),
+                SQL(", ").join(SQL("%s", tuple(row)) for row in rows[start:start + 1000]),
+            ))
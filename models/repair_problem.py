@@ -1,8 +1,15 @@
 # -*- coding: utf-8 -*-
 
+import logging
+from collections import defaultdict
+
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
 
+from .repair_metric import profiled
+
+_logger = logging.getLogger(__name__)
+
 
 class RepairProblemCategory(models.Model):
     _name = 'mobile.repair.problem.category'
@@ -21,6 +28,7 @@ class RepairProblemCategory(models.Model):
     problem_ids = fields.One2many('mobile.repair.problem', 'category_id', string='Problemas')
 
     @api.depends('problem_ids', 'problem_ids.active')
+    @profiled('compute')
     def _compute_problems_count(self):
         if not self.ids:
             for category in self:
@@ -73,12 +81,15 @@ class RepairProblem(models.Model):
     )
     usage_count = fields.Integer(
         'Veces Usado',
-        compute='_compute_usage_count',
-        store=True,
-        readonly=True
+        default=0,
+        copy=False,
+        readonly=True,
+        help="Órdenes no canceladas que reportan este problema. Se mantiene "
+             "incrementalmente al modificar las órdenes."
     )
 
     @api.depends('name', 'category_id.name')
+    @profiled('compute')
     def _compute_display_name(self):
         for problem in self:
             if problem.category_id and problem.name:
@@ -86,13 +97,69 @@ class RepairProblem(models.Model):
             else:
                 problem.display_name = problem.name or _("Nuevo Problema")
 
-    @api.depends('name')
-    def _compute_usage_count(self):
-        for problem in self:
-            problem.usage_count = self.env['mobile.repair.order'].search_count([
-                ('problem_ids', 'in', problem.id)
-            ])
+    @api.model
+    def _apply_usage_delta(self, delta):
+        """Aplica variaciones ``{problem_id: incremento}`` al contador de uso.
+
+        Los incrementos se aplican de forma relativa en base de datos, con una
+        sentencia por valor distinto, para no perder actualizaciones
+        concurrentes.
+        """
+        ids_by_delta = defaultdict(list)
+        for problem_id, increment in delta.items():
+            if increment:
+                ids_by_delta[increment].append(problem_id)
+        if not ids_by_delta:
+            return
+        self.flush_model(['usage_count'])
+        for increment, problem_ids in ids_by_delta.items():
+            self.env.cr.execute(
+                "UPDATE mobile_repair_problem SET usage_count = COALESCE(usage_count, 0) + %s WHERE id IN %s",
+                [increment, tuple(problem_ids)],
+            )
+        self.browse([pid for ids in ids_by_delta.values() for pid in ids]).invalidate_recordset(['usage_count'])
+
+    @api.model
+    def _recompute_usage_count(self):
+        """Reconstruye el contador de uso con una única agregación SQL.
+
+        Solo se actualizan los problemas cuyo contador difiere del real.
+        Devuelve los ids corregidos.
+        """
+        self.env['mobile.repair.order'].flush_model(['problem_ids', 'state'])
+        self.flush_model(['usage_count'])
+        self.env.cr.execute("""
+            UPDATE mobile_repair_problem problem
+               SET usage_count = counts.usage_count
+              FROM (
+                    SELECT p.id, COUNT(o.id) AS usage_count
+                      FROM mobile_repair_problem p
+                 LEFT JOIN mobile_repair_problem_order_rel rel ON rel.problem_id = p.id
+                 LEFT JOIN mobile_repair_order o ON o.id = rel.order_id AND o.state != 'cancelled'
+                  GROUP BY p.id
+                   ) counts
+             WHERE counts.id = problem.id
+               AND problem.usage_count IS DISTINCT FROM counts.usage_count
+         RETURNING problem.id
+        """)
+        fixed_ids = [row[0] for row in self.env.cr.fetchall()]
+        self.invalidate_model(['usage_count'])
+        return fixed_ids
+
+    @api.model
+    def _cron_reconcile_usage_count(self):
+        """Detecta y corrige desviaciones del contador de uso."""
+        fixed_ids = self._recompute_usage_count()
+        if fixed_ids:
+            _logger.warning("Contador de uso corregido en %d problemas: %s", len(fixed_ids), fixed_ids[:50])
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'category_id' in vals:
+            self.env['mobile.repair.report.problem']._sync_problem_categories(self.ids)
+        return res
 
+    @profiled('action')
     def action_view_repair_orders(self):
         self.ensure_one()
         return {
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+REPORT_DAILY_REFRESH_PARAM = 'mobile_repair_orders.report_daily_last_refresh'
+# Solape entre ejecuciones para no perder órdenes de transacciones que
+# empezaron antes del refresco y confirmaron después; rehacer un día es idempotente.
+REPORT_REFRESH_OVERLAP = timedelta(hours=1)
+# Órdenes con importes recalculados pendientes de anotar en la cola de días
+REPORT_DAILY_BUFFER_KEY = 'mobile_repair_orders.report_daily_orders'
+# Órdenes pendientes de sincronizar con el análisis por problema
+REPORT_PROBLEM_BUFFER_KEY = 'mobile_repair_orders.report_problem_orders'
+
+
+class RepairReportDaily(models.Model):
+    """Tabla de hechos diaria con los agregados de las órdenes de reparación.
+
+    Alimenta las vistas de análisis sin ejecutar ``read_group`` sobre la
+    tabla transaccional de órdenes. Cada fila agrega las órdenes recibidas un
+    mismo día por técnico, estado, compañía y marca del dispositivo.
+    """
+    _name = 'mobile.repair.report.daily'
+    _description = 'Análisis Diario de Reparaciones'
+    _order = 'date desc'
+    _rec_name = 'date'
+
+    date = fields.Date(string='Fecha Recepción', readonly=True, index=True)
+    technician_id = fields.Many2one('res.users', string='Técnico', readonly=True, index=True)
+    state = fields.Selection([
+        ('draft', 'Borrador'),
+        ('in_repair', 'En reparación'),
+        ('repaired', 'Reparado'),
+        ('delivered', 'Entregado'),
+        ('cancelled', 'Cancelado')
+    ], string='Estado', readonly=True)
+    company_id = fields.Many2one('res.company', string='Compañía', readonly=True)
+    brand_id = fields.Many2one('mobile.repair.device.brand', string='Marca', readonly=True)
+    currency_id = fields.Many2one(related='company_id.currency_id', string='Moneda', readonly=True)
+
+    order_count = fields.Integer(string='Órdenes', readonly=True)
+    amount_total = fields.Monetary(string='Importe Total', readonly=True)
+    margin = fields.Monetary(string='Margen de Beneficio', readonly=True)
+    commission_amount = fields.Monetary(string='Comisiones Pagadas', readonly=True)
+    repaired_count = fields.Integer(string='Órdenes Reparadas', readonly=True)
+    repair_time = fields.Float(string='Tiempo de Reparación (Días)', readonly=True)
+    repair_time_avg = fields.Float(string='Tiempo Medio de Reparación (Días)', readonly=True, aggregator='avg')
+
+    @api.model
+    def read_group(self, domain, fields, groupby, offset=0, limit=None, orderby=False, lazy=True):
+        """Pondera el tiempo medio de reparación por órdenes reparadas y no por filas."""
+        requested = {spec.split(':')[0] for spec in fields}
+        with_avg = 'repair_time_avg' in requested
+        if with_avg:
+            fields = [*fields, *(
+                f'{fname}:sum' for fname in ('repair_time', 'repaired_count') if fname not in requested
+            )]
+        groups = super().read_group(domain, fields, groupby, offset=offset, limit=limit, orderby=orderby, lazy=lazy)
+        if with_avg:
+            for group in groups:
+                repaired = group.get('repaired_count') or 0
+                group['repair_time_avg'] = (group.get('repair_time') or 0.0) / repaired if repaired else 0.0
+        return groups
+
+    @api.model
+    def _refresh(self, full=False):
+        """Actualiza la tabla de hechos.
+
+        Sin ``full`` solo se reconstruyen los días con órdenes modificadas
+        desde la última ejecución y los días anotados en la cola: los de
+        recálculos que no tocan ``write_date`` (importes, márgenes, comisiones)
+        y los que pierden órdenes al cambiar su fecha de recepción o al
+        borrarlas. Las escrituras de mostrador solo anotan; la reconstrucción
+        se hace aquí, fuera de sus transacciones.
+        """
+        self.env['mobile.repair.order'].flush_model()
+        Queue = self.env['mobile.repair.report.daily.queue']
+        params = self.env['ir.config_parameter'].sudo()
+        last_refresh = params.get_param(REPORT_DAILY_REFRESH_PARAM)
+        refresh_start = fields.Datetime.to_string(self.env.cr.now() - REPORT_REFRESH_OVERLAP)
+
+        # Solo se vacía lo leído: lo que se anote durante el refresco queda
+        # para la próxima ejecución
+        self.env.cr.execute("SELECT MAX(id) FROM mobile_repair_report_daily_queue")
+        last_queued = self.env.cr.fetchone()[0]
+        if full or not last_refresh:
+            inserted = self._refresh_days(None)
+        else:
+            self.env.cr.execute("""
+                SELECT date_received::date FROM mobile_repair_order
+                 WHERE write_date >= %s AND date_received IS NOT NULL
+                 UNION
+                SELECT date FROM mobile_repair_report_daily_queue WHERE id <= %s
+            """, [last_refresh, last_queued or 0])
+            inserted = self._refresh_days([row[0] for row in self.env.cr.fetchall()])
+        if last_queued:
+            self.env.cr.execute("DELETE FROM mobile_repair_report_daily_queue WHERE id <= %s", [last_queued])
+            Queue.invalidate_model()
+        params.set_param(REPORT_DAILY_REFRESH_PARAM, refresh_start)
+        return inserted
+
+    @api.model
+    def _refresh_days(self, days):
+        """Reconstruye las filas de los días indicados (todos si ``days`` es None).
+
+        Los días se reconstruyen completos (borrado e inserción agregada), así
+        que una orden que cambia de estado o de técnico queda contada en una
+        sola fila. Las órdenes se filtran por rangos de ``date_received`` para
+        aprovechar su índice. Devuelve el número de filas insertadas.
+        """
+        if days is not None and not days:
+            return 0
+        self.env['mobile.repair.order'].flush_model()
+        self.env['mobile.repair.device'].flush_model(['brand_id'])
+        if days is None:
+            self.env.cr.execute("DELETE FROM mobile_repair_report_daily")
+            day_join, day_params = "", []
+        else:
+            days = list(days)
+            self.env.cr.execute("DELETE FROM mobile_repair_report_daily WHERE date = ANY(%s)", [days])
+            day_join = """
+              JOIN unnest(%s::date[]) AS day(date)
+                ON o.date_received >= day.date::timestamp
+               AND o.date_received < (day.date + 1)::timestamp
+            """
+            day_params = [days]
+
+        self.env.cr.execute(f"""
+            INSERT INTO mobile_repair_report_daily (
+                date, technician_id, state, company_id, brand_id, order_count, amount_total,
+                margin, commission_amount, repaired_count, repair_time, repair_time_avg
+            )
+            SELECT o.date_received::date,
+                   o.technician_id,
+                   o.state,
+                   o.company_id,
+                   d.brand_id,
+                   COUNT(*),
+                   SUM(COALESCE(o.amount_total, 0)),
+                   SUM(COALESCE(o.margin, 0)),
+                   SUM(COALESCE(o.commission_amount, 0)),
+                   COUNT(*) FILTER (WHERE o.date_started IS NOT NULL AND o.date_completed IS NOT NULL),
+                   SUM(COALESCE(o.repair_time, 0)),
+                   COALESCE(
+                       SUM(COALESCE(o.repair_time, 0))
+                       / NULLIF(COUNT(*) FILTER (WHERE o.date_started IS NOT NULL AND o.date_completed IS NOT NULL), 0),
+                       0
+                   )
+              FROM mobile_repair_order o
+              {day_join}
+         LEFT JOIN mobile_repair_device d ON d.id = o.device_id
+          GROUP BY o.date_received::date, o.technician_id, o.state, o.company_id, d.brand_id
+        """, day_params)
+        inserted = self.env.cr.rowcount
+        self.invalidate_model()
+        return inserted
+
+    @api.model
+    def _queue_days(self, days):
+        """Anota días a reconstruir en el próximo refresco.
+
+        Solo inserta filas nuevas en la cola, sin clave única, así que dos
+        transacciones del mismo día no compiten por ninguna fila.
+        """
+        days = sorted({day for day in days if day})
+        if days:
+            self.env.cr.execute(
+                "INSERT INTO mobile_repair_report_daily_queue (date) SELECT unnest(%s::date[])",
+                [days],
+            )
+
+    @api.model
+    def _queue_order_days(self, order_ids):
+        """Anota los días de recepción actuales de las órdenes, p. ej. antes de moverlas o borrarlas."""
+        order_ids = [order_id for order_id in order_ids if isinstance(order_id, int)]
+        if not order_ids:
+            return
+        self.env['mobile.repair.order'].flush_model(['date_received'])
+        self.env.cr.execute(
+            "SELECT DISTINCT date_received::date FROM mobile_repair_order WHERE id = ANY(%s)",
+            [order_ids],
+        )
+        self._queue_days([row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def _queue_orders(self, order_ids):
+        """Anota órdenes con importes recalculados para encolar sus días antes del commit.
+
+        El cierre de comisiones, ``_revalue_margins`` o un cambio solo en las
+        líneas recalculan campos almacenados de la orden sin actualizar su
+        ``write_date``, así que el refresco incremental no los vería.
+        """
+        order_ids = [order_id for order_id in order_ids if isinstance(order_id, int)]
+        if not order_ids:
+            return
+        precommit = self.env.cr.precommit
+        if REPORT_DAILY_BUFFER_KEY not in precommit.data:
+            precommit.data[REPORT_DAILY_BUFFER_KEY] = set()
+            precommit.add(self._flush_queued_orders)
+        precommit.data[REPORT_DAILY_BUFFER_KEY].update(order_ids)
+
+    def _flush_queued_orders(self):
+        order_ids = self.env.cr.precommit.data.pop(REPORT_DAILY_BUFFER_KEY, set())
+        self._queue_order_days(list(order_ids))
+
+
+class RepairReportDailyQueue(models.Model):
+    """Cola de días pendientes de reconstruir en la tabla de hechos diaria.
+
+    Se escribe con SQL desde las transacciones de mostrador y se vacía en
+    cada refresco de ``mobile.repair.report.daily``.
+    """
+    _name = 'mobile.repair.report.daily.queue'
+    _description = 'Cola de Días del Análisis Diario'
+    _log_access = False
+
+    date = fields.Date(string='Fecha Recepción', required=True, readonly=True)
+
+
+class RepairReportProblem(models.Model):
+    """Fila desnormalizada por orden y problema reportado.
+
+    Evita agrupar las órdenes por el many2many ``problem_ids``: cada fila
+    lleva los datos de la orden y del dispositivo y la parte del importe de la
+    orden que corresponde al problema (importe total repartido a partes
+    iguales entre sus problemas).
+    """
+    _name = 'mobile.repair.report.problem'
+    _description = 'Análisis de Reparaciones por Problema'
+    _order = 'date_received desc'
+    _rec_name = 'order_id'
+
+    order_id = fields.Many2one('mobile.repair.order', string='Orden', readonly=True, index=True, ondelete='cascade')
+    problem_id = fields.Many2one('mobile.repair.problem', string='Problema', readonly=True, index=True, ondelete='cascade')
+    category_id = fields.Many2one('mobile.repair.problem.category', string='Categoría', readonly=True, index=True)
+    brand_id = fields.Many2one('mobile.repair.device.brand', string='Marca', readonly=True)
+    model_id = fields.Many2one('mobile.repair.device.model', string='Modelo', readonly=True)
+    state = fields.Selection([
+        ('draft', 'Borrador'),
+        ('in_repair', 'En reparación'),
+        ('repaired', 'Reparado'),
+        ('delivered', 'Entregado'),
+        ('cancelled', 'Cancelado')
+    ], string='Estado', readonly=True)
+    technician_id = fields.Many2one('res.users', string='Técnico', readonly=True)
+    company_id = fields.Many2one('res.company', string='Compañía', readonly=True)
+    currency_id = fields.Many2one(related='company_id.currency_id', string='Moneda', readonly=True)
+    date_received = fields.Datetime(string='Fecha Recepción', readonly=True, index=True)
+    date_completed = fields.Datetime(string='Reparación Completa', readonly=True)
+    repair_time = fields.Float(string='Tiempo de Reparación (Días)', readonly=True, aggregator='avg')
+    amount = fields.Monetary(string='Importe Repartido', readonly=True)
+
+    _sql_constraints = [
+        ('order_problem_uniq', 'UNIQUE(order_id, problem_id)', 'Solo puede haber una fila por orden y problema'),
+    ]
+
+    @api.model
+    def _sync_orders(self, order_ids=None):
+        """Reconstruye las filas de las órdenes indicadas (todas si no se indican).
+
+        Un DELETE y un INSERT ... SELECT por llamada, sea cual sea el número de
+        órdenes.
+        """
+        if order_ids is not None and not order_ids:
+            return
+        self.env['mobile.repair.order'].flush_model()
+        self.env['mobile.repair.device'].flush_model(['brand_id', 'model_id'])
+        self.env['mobile.repair.problem'].flush_model(['category_id'])
+        if order_ids is None:
+            self.env.cr.execute("DELETE FROM mobile_repair_report_problem")
+            order_filter, order_params = "", []
+        else:
+            order_ids = list(order_ids)
+            self.env.cr.execute("DELETE FROM mobile_repair_report_problem WHERE order_id = ANY(%s)", [order_ids])
+            order_filter, order_params = "WHERE o.id = ANY(%s)", [order_ids]
+
+        self.env.cr.execute(f"""
+            INSERT INTO mobile_repair_report_problem (
+                order_id, problem_id, category_id, brand_id, model_id, state, technician_id,
+                company_id, date_received, date_completed, repair_time, amount
+            )
+            SELECT o.id,
+                   rel.problem_id,
+                   p.category_id,
+                   d.brand_id,
+                   d.model_id,
+                   o.state,
+                   o.technician_id,
+                   o.company_id,
+                   o.date_received,
+                   o.date_completed,
+                   o.repair_time,
+                   COALESCE(o.amount_total, 0) / COUNT(*) OVER (PARTITION BY o.id)
+              FROM mobile_repair_order o
+              JOIN mobile_repair_problem_order_rel rel ON rel.order_id = o.id
+              JOIN mobile_repair_problem p ON p.id = rel.problem_id
+         LEFT JOIN mobile_repair_device d ON d.id = o.device_id
+              {order_filter}
+        """, order_params)
+        self.invalidate_model()
+
+    @api.model
+    def _queue_orders(self, order_ids):
+        """Anota órdenes para reconstruir sus filas con un único ``_sync_orders`` antes del commit.
+
+        Varias escrituras sobre las mismas órdenes en una transacción, o sobre
+        sus líneas, se sincronizan una sola vez.
+        """
+        order_ids = [order_id for order_id in order_ids if isinstance(order_id, int)]
+        if not order_ids:
+            return
+        precommit = self.env.cr.precommit
+        if REPORT_PROBLEM_BUFFER_KEY not in precommit.data:
+            precommit.data[REPORT_PROBLEM_BUFFER_KEY] = set()
+            precommit.add(self._flush_queued_orders)
+        precommit.data[REPORT_PROBLEM_BUFFER_KEY].update(order_ids)
+
+    def _flush_queued_orders(self):
+        order_ids = self.env.cr.precommit.data.pop(REPORT_PROBLEM_BUFFER_KEY, set())
+        if order_ids:
+            self._sync_orders(order_ids)
+
+    @api.model
+    def _sync_problem_categories(self, problem_ids):
+        """Propaga a las filas existentes el cambio de categoría de los problemas."""
+        self.env['mobile.repair.problem'].flush_model(['category_id'])
+        self.env.cr.execute("""
+            UPDATE mobile_repair_report_problem report
+               SET category_id = p.category_id
+              FROM mobile_repair_problem p
+             WHERE p.id = report.problem_id
+               AND p.id = ANY(%s)
+        """, [list(problem_ids)])
+        self.invalidate_model(['category_id'])
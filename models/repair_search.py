@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+import re
+
+from odoo import models, api
+from odoo.addons.phone_validation.tools.phone_validation import phone_format
+from odoo.tools import SQL
+
+# Longitud mínima del término: por debajo de tres caracteres los índices
+# trigram no pueden filtrar y la búsqueda recorrería las tablas completas
+SEARCH_MIN_LENGTH = 3
+
+
+def normalize_search_text(*values):
+    """Texto de búsqueda normalizado a partir de varios valores.
+
+    Se pasa todo a minúsculas y, para los valores con dígitos (teléfonos,
+    IMEI), se añade también su versión solo con dígitos, de modo que
+    "+34 600-123-456" se encuentre buscando "600123".
+    """
+    parts = []
+    for value in values:
+        if not value:
+            continue
+        value = ' '.join(str(value).lower().split())
+        parts.append(value)
+        digits = re.sub(r'\D', '', value)
+        if len(digits) >= SEARCH_MIN_LENGTH and digits != value:
+            parts.append(digits)
+    return ' '.join(parts) or False
+
+
+def normalize_search_term(term):
+    """Normaliza un término de búsqueda igual que ``normalize_search_text``.
+
+    Los términos formados solo por dígitos y separadores telefónicos se
+    reducen a los dígitos.
+    """
+    term = ' '.join((term or '').lower().split())
+    if re.fullmatch(r'[\d\s\-+().]+', term):
+        return re.sub(r'\D', '', term)
+    return term
+
+
+def normalize_phone_key(number, country=None):
+    """Clave telefónica normalizada en formato E.164 (``+<país><número>``).
+
+    El número se interpreta con las reglas de numeración de ``country``
+    (``phonenumbers`` a través de ``phone_validation``): se conserva el cero
+    inicial donde forma parte del número, como en los fijos italianos, y se
+    reconoce el código de país escrito sin ``+`` ni ``00``. Si no se puede
+    interpretar, los números con prefijo internacional conservan su código
+    de país y al resto se les quita un único cero de acceso nacional y se les
+    antepone el prefijo de ``country``.
+    """
+    if not number:
+        return False
+    number = number.strip()
+    digits = re.sub(r'\D', '', number)
+    if not digits:
+        return False
+    if country:
+        formatted = phone_format(number, country.code, country.phone_code, force_format='E164', raise_exception=False)
+        if formatted and re.fullmatch(r'\+\d+', formatted):
+            return formatted
+    if number.startswith('+'):
+        return '+' + digits
+    if digits.startswith('00'):
+        return '+' + digits[2:]
+    if country and country.phone_code:
+        return '+%s%s' % (country.phone_code, digits[1:] if digits.startswith('0') else digits)
+    return digits
+
+
+class RepairSearch(models.AbstractModel):
+    """Búsqueda unificada de mostrador sobre órdenes, dispositivos y clientes."""
+    _name = 'mobile.repair.search'
+    _description = 'Búsqueda Unificada de Reparaciones'
+
+    @api.model
+    def _get_search_models(self):
+        return ['mobile.repair.order', 'mobile.repair.device', 'res.partner']
+
+    @api.model
+    def _search_all(self, term, limit=20):
+        """Busca ``term`` en los tres modelos con una única consulta.
+
+        Cada modelo aporta su subconsulta (con sus reglas de registro) filtrada
+        por ``search_text`` mediante el índice trigram; los resultados se
+        ordenan por similitud de palabra. Devuelve una lista de diccionarios
+        con ``model``, ``id``, ``name`` y ``score``.
+        """
+        term = normalize_search_term(term)
+        if len(term) < SEARCH_MIN_LENGTH:
+            return []
+
+        subqueries = []
+        for model_name in self._get_search_models():
+            Model = self.env[model_name]
+            query = Model._search([('search_text', 'ilike', term)])
+            score = SQL("word_similarity(%s, %s)", term, SQL.identifier(Model._table, 'search_text'))
+            query.order = SQL("%s DESC", score)
+            query.limit = limit
+            subqueries.append(SQL(
+                "(%s)",
+                query.select(SQL("%s AS model", model_name), SQL.identifier(Model._table, 'id'), SQL("%s AS score", score)),
+            ))
+        self.env.cr.execute(SQL(
+            "%s ORDER BY score DESC LIMIT %s",
+            SQL(" UNION ALL ").join(subqueries),
+            limit,
+        ))
+        rows = self.env.cr.fetchall()
+
+        ids_by_model = {}
+        for model_name, record_id, _score in rows:
+            ids_by_model.setdefault(model_name, []).append(record_id)
+        names = {}
+        for model_name, record_ids in ids_by_model.items():
+            for record in self.env[model_name].browse(record_ids):
+                names[(model_name, record.id)] = record.display_name
+        return [
+            {'model': model_name, 'id': record_id, 'name': names.get((model_name, record_id)), 'score': score}
+            for model_name, record_id, score in rows
+        ]
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+
+from . import test_performance
+from . import test_repair_order
+from . import test_repair_report
+from . import test_repair_metric
+from . import test_device
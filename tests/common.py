@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from odoo.tests import TransactionCase
+
+# Fichero JSON Lines donde se acumulan los resultados para comparar versiones.
+# Por defecto va al directorio temporal para no ensuciar el directorio de trabajo.
+BENCH_OUTPUT_ENV = 'MOBILE_REPAIR_BENCH_OUTPUT'
+BENCH_OUTPUT_DEFAULT = os.path.join(tempfile.gettempdir(), 'mobile_repair_bench.jsonl')
+# Tamaños con los que se mide cada escenario y consultas de más admitidas en
+# el mayor: el presupuesto es relativo, no depende de la base de datos
+SCALING_SIZES = (10, 40)
+SCALING_SLACK = 5
+
+
+def make_imei(serial):
+    """IMEI válido (15 dígitos con dígito de control Luhn) a partir de un número de serie."""
+    body = '35%012d' % serial
+    total = 0
+    for position, char in enumerate(reversed(body)):
+        digit = int(char)
+        if position % 2 == 0:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return body + str((10 - total % 10) % 10)
+
+
+class RepairCommon(TransactionCase):
+    """Base de las pruebas del módulo: prepara un catálogo mínimo."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.brand = cls.env['mobile.repair.device.brand'].create({'name': 'Benchmark'})
+        cls.device_model = cls.env['mobile.repair.device.model'].create({'name': 'Bench 1', 'brand_id': cls.brand.id})
+        cls.category = cls.env['mobile.repair.problem.category'].create({'name': 'Pantalla'})
+        cls.problem = cls.env['mobile.repair.problem'].create({'name': 'Pantalla rota', 'category_id': cls.category.id})
+        cls.partner = cls.env['res.partner'].create({'name': 'Cliente Benchmark', 'phone': '+34 600 123 456'})
+        cls.technician = cls.env['res.users'].create({
+            'name': 'Técnico Benchmark',
+            'login': 'bench_technician',
+            'groups_id': [(6, 0, [cls.env.ref('mobile_repair_orders.group_mobile_repair_user').id])],
+        })
+        cls.tax = cls.env['account.tax'].create({
+            'name': 'IVA Benchmark 21%',
+            'amount': 21.0,
+            'amount_type': 'percent',
+            'type_tax_use': 'sale',
+        })
+        cls.service = cls.env['product.product'].create({
+            'name': 'Mano de obra',
+            'type': 'service',
+            'list_price': 30.0,
+            'standard_price': 10.0,
+        })
+        cls.part = cls.env['product.product'].create({
+            'name': 'Pantalla Bench 1',
+            'type': 'consu',
+            'is_storable': True,
+            'list_price': 120.0,
+            'standard_price': 70.0,
+        })
+        cls.location = cls.env['stock.warehouse'].search([('company_id', '=', cls.env.company.id)], limit=1).lot_stock_id
+        cls.env['stock.quant']._update_available_quantity(cls.part, cls.location, 1000000)
+        cls._imei_serial = 0
+
+    def _device_vals(self, count):
+        vals_list = []
+        for _ in range(count):
+            type(self)._imei_serial += 1
+            vals_list.append({
+                'brand_id': self.brand.id,
+                'model_id': self.device_model.id,
+                'imei': make_imei(type(self)._imei_serial),
+            })
+        return vals_list
+
+    def _order_vals(self, count, lines=2, storable=False):
+        devices = self.env['mobile.repair.device'].create(self._device_vals(count))
+        line_product = self.part if storable else self.service
+        return [{
+            'partner_id': self.partner.id,
+            'device_id': device.id,
+            'technician_id': self.technician.id,
+            'problem_ids': [(6, 0, self.problem.ids)],
+            'problem_description': 'La pantalla no responde al tacto',
+            'location_id': self.location.id,
+            'order_line': [(0, 0, {
+                'product_id': line_product.id,
+                'name': line_product.name,
+                'product_uom_qty': 1.0,
+                'product_uom': line_product.uom_id.id,
+                'price_unit': line_product.list_price,
+                'tax_id': [(6, 0, self.tax.ids)],
+            }) for _ in range(lines)],
+        } for device in devices]
+
+    def _create_orders(self, count, **kwargs):
+        return self.env['mobile.repair.order'].create(self._order_vals(count, **kwargs))
+
+
+class RepairBenchmarkCase(RepairCommon):
+    """Base de los escenarios de rendimiento del módulo.
+
+    Ofrece ``measure``, que registra la duración y las consultas de un
+    escenario, y ``assertQueriesScale``, que comprueba que las consultas no
+    crecen con el número de registros.
+    """
+
+    @contextmanager
+    def measure(self, scenario, records):
+        """Ejecuta un escenario y añade su duración y consultas al fichero de resultados.
+
+        Las escrituras pendientes se vuelcan dentro de la medida. El
+        diccionario que se entrega recibe ``queries`` y ``seconds`` al salir.
+        """
+        self.env.flush_all()
+        self.env.invalidate_all()
+        result = {}
+        queries_before = self.cr.sql_log_count
+        start = time.perf_counter()
+        yield result
+        self.env.flush_all()
+        result['seconds'] = time.perf_counter() - start
+        result['queries'] = self.cr.sql_log_count - queries_before
+        self.record_result(scenario, records, result['seconds'], result['queries'])
+
+    def assertQueriesScale(self, scenario, prepare, sizes=SCALING_SIZES, slack=SCALING_SLACK):
+        """Comprueba que las consultas de un escenario no dependen del número de registros.
+
+        ``prepare(size)`` crea los datos y devuelve la función que se mide. El
+        escenario se mide con cada tamaño de ``sizes`` y el mayor solo puede
+        hacer ``slack`` consultas más que el menor (cachés que se llenan una
+        vez, secuencias). Una consulta por registro lo supera de sobra.
+        """
+        counts = {}
+        for size in sizes:
+            step = prepare(size)
+            with self.measure(scenario, size) as result:
+                step()
+            counts[size] = result['queries']
+        small, large = min(sizes), max(sizes)
+        self.assertLessEqual(
+            counts[large], counts[small] + slack,
+            f"{scenario}: {counts[small]} consultas con {small} registros y {counts[large]} con {large}",
+        )
+        return counts
+
+    def record_result(self, scenario, records, seconds, queries=None, **extra):
+        result = {
+            'scenario': scenario,
+            'records': records,
+            'seconds': round(seconds, 6),
+            'queries': queries,
+            'module_version': self.env.ref('base.module_mobile_repair_orders').latest_version,
+            'date': datetime.now().isoformat(timespec='seconds'),
+            **extra,
+        }
+        path = os.environ.get(BENCH_OUTPUT_ENV, BENCH_OUTPUT_DEFAULT)
+        with open(path, 'a', encoding='utf-8') as output:
+            output.write(json.dumps(result) + '\n')
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+from odoo.tools.sql import index_exists
+
+from .common import RepairCommon, make_imei
+
+
+@tagged('post_install', '-at_install')
+class TestRepairDeviceImeiIndex(RepairCommon):
+
+    def test_duplicates_skip_unique_index(self):
+        devices = self.env['mobile.repair.device'].create(self._device_vals(2))
+        self.env.flush_all()
+        self.env.cr.execute("DROP INDEX mobile_repair_device_imei_uniq")
+        self.env.cr.execute("UPDATE mobile_repair_device SET imei = %s WHERE id = ANY(%s)", [make_imei(999999), devices.ids])
+        with self.assertLogs('odoo.addons.mobile_repair_orders.models.device', 'WARNING') as logs:
+            self.env['mobile.repair.device'].init()
+        self.assertFalse(index_exists(self.env.cr, 'mobile_repair_device_imei_uniq'))
+        self.assertIn(f'{devices[0].id}, {devices[1].id}', logs.output[0])
+
+        self.env.cr.execute("UPDATE mobile_repair_device SET imei = NULL WHERE id = %s", [devices[1].id])
+        self.env['mobile.repair.device'].init()
+        self.assertTrue(index_exists(self.env.cr, 'mobile_repair_device_imei_uniq'))
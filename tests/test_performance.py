@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""Escenarios de rendimiento del módulo de reparaciones.
+
+Cada escenario se mide con 10 y 40 registros y comprueba que el número de
+consultas SQL no crece con ellos (ver ``RepairBenchmarkCase``); así se
+detecta una consulta por registro sin depender de cifras absolutas, que
+cambian con la base de datos y los módulos instalados. Las transferencias y
+facturas dependen del stock y la contabilidad estándar, que hacen consultas
+por movimiento, así que se comparan entre sí: en bloque contra una a una.
+
+Duración y consultas se registran en el fichero de resultados. Los
+escenarios de 10.000 registros llevan la etiqueta ``mobile_repair_perf_heavy``,
+solo registran resultados y quedan fuera de la ejecución estándar::
+
+    odoo-bin -d db -i mobile_repair_orders --test-tags /mobile_repair_orders:mobile_repair_perf
+    odoo-bin -d db --test-tags /mobile_repair_orders:mobile_repair_perf_heavy
+"""
+
+import base64
+import io
+import json
+import random
+import time
+
+from PIL import Image
+
+from odoo.tests import HttpCase, tagged
+
+from .common import RepairBenchmarkCase
+
+
+@tagged('post_install', '-at_install', 'mobile_repair_perf')
+class TestRepairCreatePerformance(RepairBenchmarkCase):
+
+    def test_order_create(self):
+        Order = self.env['mobile.repair.order']
+
+        def prepare(size):
+            vals_list = self._order_vals(size)
+            return lambda: Order.create(vals_list)
+        self.assertQueriesScale('order_create', prepare)
+
+    def test_device_create(self):
+        Device = self.env['mobile.repair.device']
+
+        def prepare(size):
+            vals_list = self._device_vals(size)
+            return lambda: Device.create(vals_list)
+        self.assertQueriesScale('device_create', prepare)
+
+
+@tagged('post_install', '-at_install', '-standard', 'mobile_repair_perf_heavy')
+class TestRepairCreateHeavyPerformance(RepairBenchmarkCase):
+
+    def test_order_create_heavy(self):
+        vals_list = self._order_vals(10000)
+        with self.measure('order_create', 10000):
+            self.env['mobile.repair.order'].create(vals_list)
+
+    def test_device_create_heavy(self):
+        vals_list = self._device_vals(10000)
+        with self.measure('device_create', 10000):
+            self.env['mobile.repair.device'].create(vals_list)
+
+
+@tagged('post_install', '-at_install', 'mobile_repair_perf')
+class TestRepairWorkflowPerformance(RepairBenchmarkCase):
+
+    def test_state_transitions(self):
+        for action in ('action_start_repair', 'action_mark_repaired', 'action_deliver'):
+            def prepare(size, action=action):
+                orders = self._create_orders(size)
+                if action != 'action_start_repair':
+                    orders.action_start_repair()
+                if action == 'action_deliver':
+                    orders.action_mark_repaired()
+                return getattr(orders, action)
+            self.assertQueriesScale(action, prepare)
+
+    def test_recompute_amounts(self):
+        def prepare(size):
+            orders = self._create_orders(size, lines=5)
+
+            def step():
+                self.env.add_to_compute(orders.order_line._fields['price_subtotal'], orders.order_line)
+                self.env.add_to_compute(orders._fields['amount_total'], orders)
+            return step
+        self.assertQueriesScale('compute_amounts', prepare)
+
+    def test_recompute_margin(self):
+        def prepare(size):
+            orders = self._create_orders(size, lines=5)
+            return lambda: self.env.add_to_compute(orders._fields['margin'], orders)
+        self.assertQueriesScale('compute_margin', prepare)
+
+    def test_tax_memo(self):
+        """Muchas líneas con los mismos impuestos y precio reutilizan el cálculo."""
+        def prepare(size):
+            lines = self._create_orders(size, lines=50).order_line
+            return lambda: self.env.add_to_compute(lines._fields['price_subtotal'], lines)
+        self.assertQueriesScale('compute_line_amount', prepare)
+
+    def test_create_stock_picking_grouped(self):
+        """Una oleada para todas las órdenes cuesta menos que una transferencia por orden."""
+        single_orders = self._create_orders(40, storable=True)
+        with self.measure('create_stock_picking', len(single_orders)) as single:
+            pickings = single_orders._create_stock_picking()
+        self.assertEqual(len(pickings), 40)
+        grouped_orders = self._create_orders(40, storable=True)
+        with self.measure('create_stock_picking_grouped', len(grouped_orders)) as grouped:
+            wave = grouped_orders._create_stock_picking(grouped=True)
+        self.assertEqual(len(wave), 1)
+        self.assertLess(grouped['queries'], single['queries'])
+
+    def test_create_invoice_batch(self):
+        """La facturación en bloque no crece con las órdenes y cuesta menos que una a una."""
+        single_orders = self._create_orders(10)
+        single_orders.write({'state': 'delivered'})
+        with self.measure('action_create_invoice', len(single_orders)) as single:
+            for order in single_orders:
+                order.action_create_invoice()
+        self.assertTrue(all(single_orders.mapped('invoice_id')))
+
+        def prepare(size):
+            orders = self._create_orders(size)
+            orders.write({'state': 'delivered'})
+            return orders.action_create_invoice_batch
+        counts = self.assertQueriesScale('action_create_invoice_batch', prepare)
+        self.assertLess(counts[10], single['queries'])
+
+    def test_kanban_payload(self):
+        """Carga del kanban con el avatar del técnico incrustado frente a servido por URL.
+
+        Antes cada tarjeta incluía ``technician_id.image_128`` en base64; ahora
+        el widget ``many2one_avatar_user`` pide la imagen a ``/web/image``.
+        """
+        self.technician.image_1920 = self._make_avatar()
+        orders = self._create_orders(80)
+        spec = {name: {} for name in (
+            'name', 'device_info', 'partner_id', 'state', 'priority', 'amount_total', 'currency_id',
+        )}
+        payloads = {}
+        for scenario, technician_spec in (
+            ('kanban_payload_inline_avatar', {'fields': {'display_name': {}, 'image_128': {}}}),
+            ('kanban_payload_avatar_url', {'fields': {'display_name': {}}}),
+        ):
+            self.env.invalidate_all()
+            start = time.perf_counter()
+            result = orders.web_read(dict(spec, technician_id=technician_spec))
+            elapsed = time.perf_counter() - start
+            payloads[scenario] = len(json.dumps(result, default=str))
+            self.record_result(scenario, len(orders), elapsed, payload_bytes=payloads[scenario])
+        self.assertLess(payloads['kanban_payload_avatar_url'] * 2, payloads['kanban_payload_inline_avatar'])
+
+    @staticmethod
+    def _make_avatar():
+        """Avatar de 128 px sin patrones, para que no se comprima por debajo de lo realista."""
+        image = Image.frombytes('RGB', (128, 128), bytes(random.Random(7).getrandbits(8) for _ in range(128 * 128 * 3)))
+        output = io.BytesIO()
+        image.save(output, format='PNG')
+        return base64.b64encode(output.getvalue())
+
+
+@tagged('post_install', '-at_install', '-standard', 'mobile_repair_perf_heavy')
+class TestRepairWorkflowHeavyPerformance(RepairBenchmarkCase):
+
+    def test_recompute_amounts_heavy(self):
+        orders = self._create_orders(10000)
+        with self.measure('compute_amounts', 10000):
+            self.env.add_to_compute(orders.order_line._fields['price_subtotal'], orders.order_line)
+            self.env.add_to_compute(orders._fields['amount_total'], orders)
+
+    def test_tax_memo_heavy(self):
+        """50.000 líneas: cálculo memorizado frente a un ``compute_all`` por línea."""
+        orders = self._create_orders(1000, lines=50)
+        lines = orders.order_line
+        with self.measure('compute_line_amount', len(lines)):
+            self.env.add_to_compute(lines._fields['price_subtotal'], lines)
+
+        # Referencia: el cálculo anterior, sin reutilizar resultados entre líneas
+        with self.measure('compute_line_amount_unmemoized', len(lines)):
+            for line in lines:
+                order = line.repair_order_id
+                line.tax_id.compute_all(
+                    line.price_unit * (1 - (line.discount or 0.0) / 100.0),
+                    order.currency_id,
+                    line.product_uom_qty,
+                    product=line.product_id,
+                    partner=order.partner_id,
+                )
+
+
+@tagged('post_install', '-at_install', 'mobile_repair_perf')
+class TestRepairRoutesPerformance(RepairBenchmarkCase, HttpCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.technician.password = 'bench_technician'
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate('bench_technician', 'bench_technician')
+
+    def _create_customer_orders(self, size):
+        partner = self.partner.copy({'name': f'Cliente Benchmark {size}'})
+        vals_list = self._order_vals(size)
+        for vals in vals_list:
+            vals['partner_id'] = partner.id
+        orders = self.env['mobile.repair.order'].create(vals_list)
+        orders[:size // 3].write({'state': 'delivered'})
+        return partner, orders
+
+    def test_customer_stats_route(self):
+        results = {}
+
+        def prepare(size):
+            partner, orders = self._create_customer_orders(size)
+
+            def step():
+                results[size] = (self.make_jsonrpc_request(f'/repair/customer/{partner.id}/stats'), orders)
+            return step
+        self.assertQueriesScale('route_customer_stats', prepare)
+        stats, orders = results[40]
+        self.assertEqual(stats['total_repairs'], 40)
+        self.assertEqual(stats['completed_repairs'], len(orders.filtered(lambda o: o.state == 'delivered')))
+
+    def test_recent_repairs_route(self):
+        etags = {}
+
+        def prepare(size):
+            partner, _orders = self._create_customer_orders(size)
+            route = f'/repair/customer/{partner.id}/recent_repairs'
+
+            def step():
+                first = self.make_jsonrpc_request(route)
+                self.assertTrue(first['html'])
+                etags[size] = (route, first['etag'])
+            return step
+        self.assertQueriesScale('route_recent_repairs', prepare)
+
+        def prepare_not_modified(size):
+            route, etag = etags[size]
+            return lambda: self.assertTrue(self.make_jsonrpc_request(route, {'etag': etag})['not_modified'])
+        self.assertQueriesScale('route_recent_repairs_not_modified', prepare_not_modified)
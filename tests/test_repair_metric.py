@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+from odoo import fields
+from odoo.exceptions import AccessError
+from odoo.tests import tagged
+
+from odoo.addons.mobile_repair_orders.models.repair_metric import (
+    PROFILING_FLUSH_INTERVAL,
+    PROFILING_PARAM,
+    MetricAggregator,
+    aggregator,
+)
+
+from .common import RepairCommon
+
+
+@tagged('post_install', '-at_install')
+class TestRepairMetric(RepairCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.Metric = self.env['mobile.repair.metric']
+        self.dbname = self.env.cr.dbname
+        aggregator.drain(self.dbname)
+        self.addCleanup(aggregator.drain, self.dbname)
+
+    def test_aggregator_sums_and_drains(self):
+        stats = MetricAggregator()
+        stats.add('db', 'compute', 'model._compute_x', 10, 3, 0.5)
+        stats.add('db', 'compute', 'model._compute_x', 5, 2, 1.5)
+        stats.add('other', 'route', 'Controller.route', 0, 1, 0.1)
+        self.assertEqual(stats.drain('db'), {('compute', 'model._compute_x'): [2, 15, 5, 2.0, 1.5]})
+        self.assertEqual(stats.drain('db'), {})
+        self.assertIn(('route', 'Controller.route'), stats.drain('other'))
+
+    def test_aggregator_schedules_one_flush_per_interval(self):
+        stats = MetricAggregator()
+        self.assertFalse(stats.schedule_flush('db'))
+        stats._last_flush['db'] -= PROFILING_FLUSH_INTERVAL
+        self.assertTrue(stats.schedule_flush('db'))
+        self.assertFalse(stats.schedule_flush('db'))
+
+    def test_profiled_records_only_when_enabled(self):
+        orders = self._create_orders(3)
+        orders[0].action_start_repair()
+        self.assertEqual(aggregator.drain(self.dbname), {})
+
+        self.env['ir.config_parameter'].sudo().set_param(PROFILING_PARAM, 'True')
+        orders[1:].action_start_repair()
+        stats = aggregator.drain(self.dbname)
+        calls, records, queries, duration, duration_max = stats['action', 'mobile.repair.order.action_start_repair']
+        self.assertEqual((calls, records), (1, 2))
+        self.assertGreater(queries, 0)
+        self.assertGreaterEqual(duration, duration_max)
+
+    def test_flush_stores_drained_stats(self):
+        aggregator.add(self.dbname, 'compute', 'mobile.repair.order._compute_amounts', 100, 4, 0.25)
+        self.assertEqual(self.Metric._flush(), 1)
+        metric = self.Metric.search([('name', '=', 'mobile.repair.order._compute_amounts')])
+        self.assertEqual((metric.call_count, metric.record_count, metric.query_count), (1, 100, 4))
+        self.assertAlmostEqual(metric.duration_total, 250.0)
+        self.assertEqual(self.Metric._flush(), 0)
+
+    def test_top_offenders(self):
+        now = fields.Datetime.now()
+        self.Metric.create([
+            {'kind': 'compute', 'name': 'fast', 'call_count': 10, 'query_count': 50, 'duration_total': 20.0, 'duration_max': 5.0},
+            {'kind': 'compute', 'name': 'slow', 'call_count': 2, 'query_count': 4, 'duration_total': 300.0, 'duration_max': 200.0},
+            {'kind': 'compute', 'name': 'slow', 'call_count': 2, 'query_count': 6, 'duration_total': 100.0, 'duration_max': 80.0},
+            {'kind': 'route', 'name': 'old', 'call_count': 1, 'duration_total': 9000.0, 'date': now - timedelta(days=2)},
+        ])
+        top = self.Metric._get_top_offenders()
+        self.assertEqual([row['name'] for row in top], ['slow', 'fast'])
+        self.assertEqual(top[0]['call_count'], 4)
+        self.assertEqual(top[0]['query_count'], 10)
+        self.assertEqual(top[0]['duration_avg'], 100.0)
+        self.assertEqual(top[0]['duration_max'], 200.0)
+        by_queries = self.Metric._get_top_offenders(order='query_count', limit=1)
+        self.assertEqual([row['name'] for row in by_queries], ['fast'])
+
+    def test_top_offenders_requires_manager(self):
+        with self.assertRaises(AccessError):
+            self.Metric.with_user(self.technician)._get_top_offenders()
+        self.technician.groups_id = [(4, self.env.ref('mobile_repair_orders.group_mobile_repair_manager').id)]
+        self.assertEqual(self.Metric.with_user(self.technician)._get_top_offenders(), [])
@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date, datetime, timedelta
+
+from odoo import fields
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from odoo.addons.mobile_repair_orders.models.repair_search import normalize_phone_key
+
+from .common import RepairCommon
+
+
+@tagged('post_install', '-at_install')
+class TestRepairOrderMargin(RepairCommon):
+
+    def test_revalue_margins_uses_new_cost(self):
+        orders = self._create_orders(3)
+        self.assertEqual(orders[0].margin, orders[0].amount_total - 2 * 10.0)
+
+        self.service.standard_price = 25.0
+        self.env.flush_all()
+        self.assertEqual(orders[0].margin, orders[0].amount_total - 2 * 10.0, "El margen histórico no se revaloriza solo")
+
+        self.env['mobile.repair.order']._revalue_margins([('id', 'in', orders.ids)])
+        for order in orders:
+            self.assertEqual(order.order_line.mapped('cost_price'), [25.0, 25.0])
+            self.assertAlmostEqual(order.margin, order.amount_total - 2 * 25.0)
+
+    def test_mark_repaired_refreshes_margin(self):
+        order = self._create_orders(1)
+        order.action_start_repair()
+        self.service.standard_price = 12.0
+        order.action_mark_repaired()
+        self.env.flush_all()
+        self.assertAlmostEqual(order.margin, order.amount_total - 2 * 12.0)
+
+
+@tagged('post_install', '-at_install')
+class TestRepairOrderAmounts(RepairCommon):
+
+    def test_memoized_line_amounts_match_compute_all(self):
+        orders = self._create_orders(2, lines=6)
+        variants = [
+            {},
+            {'discount': 10.0},
+            {'product_uom_qty': 3.0},
+            {'tax_id': [(5, 0, 0)]},
+            {'tax_id': [(5, 0, 0)], 'price_unit': 45.5},
+            {'product_id': self.part.id, 'price_unit': 120.0},
+        ]
+        for order in orders:
+            for line, vals in zip(order.order_line, variants):
+                line.write(vals)
+        orders[1].partner_id = self.env['res.partner'].create({'name': 'Otro Cliente'})
+        self.env.flush_all()
+        for line in orders.order_line:
+            taxes = line.tax_id.compute_all(
+                line.price_unit * (1 - line.discount / 100.0),
+                line.currency_id,
+                line.product_uom_qty,
+                product=line.product_id,
+                partner=line.repair_order_id.partner_id,
+            )
+            self.assertAlmostEqual(line.price_subtotal, taxes['total_excluded'])
+            self.assertAlmostEqual(line.price_total, taxes['total_included'])
+
+
+@tagged('post_install', '-at_install')
+class TestRepairOrderCommission(RepairCommon):
+
+    def test_monthly_volumes_use_utc_months(self):
+        vals_list = self._order_vals(2)
+        vals_list[0]['date_received'] = datetime(2026, 3, 31, 23, 30)
+        vals_list[1]['date_received'] = datetime(2026, 3, 10, 12, 0)
+        orders = self.env['mobile.repair.order'].with_context(tz='Europe/Madrid').create(vals_list)
+        volumes = orders._get_technician_monthly_volumes()
+        self.assertAlmostEqual(volumes[self.technician.id, date(2026, 3, 1)], sum(orders.mapped('amount_total')))
+        self.assertNotIn((self.technician.id, date(2026, 4, 1)), volumes)
+
+@tagged('post_install', '-at_install')
+class TestRepairOrderTransitions(RepairCommon):
+
+    def test_bulk_actions_reject_closed_orders(self):
+        orders = self._create_orders(2)
+        orders.action_start_repair()
+        orders.action_mark_repaired()
+        orders[0].action_deliver()
+        with self.assertRaises(UserError):
+            orders.action_cancel()
+        with self.assertRaises(UserError):
+            orders.action_reset_to_draft()
+        self.assertEqual(orders.mapped('state'), ['delivered', 'repaired'])
+
+    def test_reset_cancelled_order_to_draft(self):
+        order = self._create_orders(1, storable=True)
+        order.action_start_repair()
+        picking = order.stock_picking_id
+        order.action_cancel()
+        order.action_reset_to_draft()
+        self.assertEqual(order.state, 'draft')
+        self.assertFalse(order.date_started)
+        self.assertFalse(order.stock_picking_id)
+        self.assertEqual(picking.state, 'cancel')
+
+@tagged('post_install', '-at_install')
+class TestRepairOrderSequence(RepairCommon):
+
+    def test_numbering_restarts_each_year(self):
+        Sequence = self.env['ir.sequence']
+        code = 'mobile.repair.order'
+        self.assertEqual(
+            Sequence.next_block_by_code(code, 2, sequence_date=date(2098, 12, 31)),
+            ['REP2098-0001', 'REP2098-0002'],
+        )
+        self.assertEqual(Sequence.next_block_by_code(code, 1, sequence_date=date(2099, 1, 1)), ['REP2099-0001'])
+        self.assertEqual(Sequence.next_block_by_code(code, 1, sequence_date=date(2098, 6, 1)), ['REP2098-0003'])
+
+    def test_switch_keeps_current_year_counter(self):
+        sequence = self.env['ir.sequence'].create({
+            'name': 'Órdenes antiguas',
+            'code': 'mobile.repair.order.legacy',
+            'prefix': 'REP%(year)s-',
+            'padding': 4,
+            'number_next': 1532,
+        })
+        sequence._switch_to_no_gap()
+        self.assertEqual((sequence.implementation, sequence.use_date_range), ('no_gap', True))
+        year = fields.Date.today().year
+        self.assertEqual(sequence._next_block(1), [f'REP{year}-1532'])
+        self.assertEqual(sequence._next_block(1, sequence_date=date(year + 1, 1, 1)), [f'REP{year + 1}-0001'])
+
+@tagged('post_install', '-at_install')
+class TestRepairOrderProblemUsage(RepairCommon):
+
+    def test_cancel_decrements_archived_problem(self):
+        order = self._create_orders(1)
+        usage = self.problem.usage_count
+        self.problem.active = False
+        order.action_cancel()
+        self.assertEqual(self.problem.usage_count, usage - 1)
+        order.unlink()
+        self.assertEqual(self.problem.usage_count, usage - 1)
+
+@tagged('post_install', '-at_install')
+class TestRepairOrderWavePicking(RepairCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.orders = self._create_orders(2, storable=True)
+        self.wave = self.orders._create_stock_picking(grouped=True)
+
+    def test_mark_repaired_validates_only_own_moves(self):
+        first, second = self.orders
+        self.orders.write({'state': 'in_repair'})
+        first.action_mark_repaired()
+        self.assertNotEqual(first.stock_picking_id, self.wave)
+        self.assertEqual(first.stock_picking_id.state, 'done')
+        self.assertEqual(second.stock_picking_id, self.wave)
+        self.assertEqual(self.wave.move_ids.repair_order_id, second)
+        self.assertEqual(set(self.wave.move_ids.mapped('state')), {'assigned'})
+
+    def test_technician_mark_repaired_keeps_colleague_moves(self):
+        first, second = self.orders
+        colleague = self.technician.copy({'name': 'Compañero Benchmark', 'login': 'bench_colleague'})
+        second.technician_id = colleague
+        self.technician.groups_id = [(4, self.env.ref('stock.group_stock_user').id)]
+        self.orders.write({'state': 'in_repair'})
+        first.with_user(self.technician).action_mark_repaired()
+        self.assertEqual(first.stock_picking_id.state, 'done')
+        self.assertEqual(second.stock_picking_id, self.wave)
+        self.assertEqual(self.wave.move_ids.repair_order_id, second)
+        self.assertEqual(set(self.wave.move_ids.mapped('state')), {'assigned'})
+
+    def test_cancel_keeps_other_orders_moves(self):
+        first, second = self.orders
+        first.action_cancel()
+        self.assertEqual(first.stock_picking_id.state, 'cancel')
+        self.assertEqual(second.stock_picking_id, self.wave)
+        self.assertEqual(self.wave.state, 'assigned')
+
+
+@tagged('post_install', '-at_install')
+class TestRepairOrderSla(RepairCommon):
+
+    def setUp(self):
+        super().setUp()
+        now = fields.Datetime.now()
+        vals = self._order_vals(1)[0]
+        vals.update(date_received=now - timedelta(days=5), date_promised=now + timedelta(days=3))
+        self.order = self.env['mobile.repair.order'].create(vals)
+        self.activity_type = self.env.ref('mobile_repair_orders.mail_activity_type_sla')
+
+    def _sla_activities(self):
+        return self.order.activity_ids.filtered(lambda a: a.activity_type_id == self.activity_type)
+
+    def test_transitions_keep_a_single_activity(self):
+        self.assertEqual(self.order.sla_status, 'on_time')
+        self.assertFalse(self._sla_activities())
+
+        self.order.date_promised = fields.Datetime.now() + timedelta(hours=2)
+        self.assertEqual(self.order.sla_status, 'at_risk')
+        self.assertEqual(len(self._sla_activities()), 1)
+
+        self.order.date_promised = fields.Datetime.now() - timedelta(hours=1)
+        self.assertEqual(self.order.sla_status, 'overdue')
+        activity = self._sla_activities()
+        self.assertEqual(len(activity), 1)
+        self.assertEqual(activity.summary, 'Reparación vencida')
+        self.assertEqual(activity.user_id, self.technician)
+
+        self.order.date_promised = fields.Datetime.now() + timedelta(days=2)
+        self.assertEqual(self.order.sla_status, 'on_time')
+        self.assertFalse(self._sla_activities())
+
+    def test_reassignment_moves_activity(self):
+        self.order.date_promised = fields.Datetime.now() - timedelta(hours=1)
+        colleague = self.technician.copy({'name': 'Compañero Benchmark', 'login': 'bench_colleague'})
+        self.order.technician_id = colleague
+        activity = self._sla_activities()
+        self.assertEqual(len(activity), 1)
+        self.assertEqual(activity.user_id, colleague)
+        self.assertEqual(self.order.sla_status, 'overdue')
+
+    def test_closing_clears_status_and_activity(self):
+        self.order.date_promised = fields.Datetime.now() - timedelta(hours=1)
+        self.assertTrue(self._sla_activities())
+        self.order.write({'state': 'delivered'})
+        self.assertFalse(self.order.sla_status)
+        self.assertFalse(self._sla_activities())
+
+    def test_cron_only_touches_changed_orders(self):
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE mobile_repair_order SET date_promised = %s WHERE id = %s",
+            [fields.Datetime.now() - timedelta(hours=1), self.order.id],
+        )
+        self.order.invalidate_recordset()
+        write_date = self.order.write_date
+        Order = self.env['mobile.repair.order']
+        self.assertEqual(Order._cron_update_sla_status(), 1)
+        self.assertEqual(self.order.sla_status, 'overdue')
+        self.assertEqual(self.order.write_date, write_date)
+        self.assertEqual(len(self._sla_activities()), 1)
+        self.assertEqual(Order._cron_update_sla_status(), 0)
+
+
+@tagged('post_install', '-at_install')
+class TestRepairOrderKeyset(RepairCommon):
+
+    def setUp(self):
+        super().setUp()
+        # Un único ``create``: todas las órdenes comparten ``create_date``
+        self.orders = self._create_orders(7, lines=0)
+        self.orders[:2].write({'priority': 'urgent'})
+        self.env.flush_all()
+        self.env.cr.execute("UPDATE mobile_repair_order SET priority = NULL WHERE id = ANY(%s)", [self.orders[2:4].ids])
+        self.orders.invalidate_recordset(['priority'])
+        self.Order = self.env['mobile.repair.order']
+
+    def _all_pages(self, limit):
+        domain = [('id', 'in', self.orders.ids)]
+        ids, cursor = [], None
+        while True:
+            page = self.Order._search_keyset(domain, cursor=cursor, limit=limit, fields=['id'])
+            ids += [record['id'] for record in page['records']]
+            cursor = page['next_cursor']
+            if not cursor:
+                return ids
+
+    def test_pages_cover_every_order_once(self):
+        self.assertEqual(len(set(self.orders.mapped('create_date'))), 1)
+        for limit in (1, 2, 3, 7):
+            ids = self._all_pages(limit)
+            self.assertEqual(len(ids), len(set(ids)), "Ninguna orden se repite entre páginas")
+            self.assertEqual(set(ids), set(self.orders.ids), "Ninguna orden se salta")
+            self.assertEqual(ids[:2], sorted(self.orders[:2].ids, reverse=True))
+            self.assertEqual(ids[2:], sorted(self.orders[2:].ids, reverse=True))
+
+    def test_invalid_cursor(self):
+        for cursor in ('no-es-un-cursor', 'W10=', 'WyJub3JtYWwiLCAiYXllciIsIDFd'):
+            with self.assertRaises(UserError):
+                self.Order._search_keyset([], cursor=cursor)
+
+
+@tagged('post_install', '-at_install')
+class TestRepairOrderRecentRepairs(RepairCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.orders = self._create_orders(2)
+        self.Order = self.env['mobile.repair.order']
+
+    def test_stamp_follows_device_rename(self):
+        stamp = self.Order._get_recent_repairs_stamp(self.partner.id)
+        self.device_model.name = 'Bench 2'
+        new_stamp = self.Order._get_recent_repairs_stamp(self.partner.id)
+        self.assertNotEqual(new_stamp, stamp)
+        self.assertIn('Bench 2', self.Order._render_recent_repairs_html(self.partner.id, new_stamp))
+
+    def test_cache_key_includes_allowed_companies(self):
+        company = self.env.company
+        other = self.env['res.company'].create({'name': 'Sucursal Benchmark'})
+        self.env.user.company_ids |= other
+        stamp = self.Order._get_recent_repairs_stamp(self.partner.id)
+        single = self.Order.with_context(allowed_company_ids=[company.id])
+        both = self.Order.with_context(allowed_company_ids=[company.id, other.id])
+        self.assertNotEqual(
+            single._get_recent_repairs_etag(self.partner.id, stamp),
+            both._get_recent_repairs_etag(self.partner.id, stamp),
+        )
+
+
+@tagged('post_install', '-at_install')
+class TestRepairOrderCaller(RepairCommon):
+
+    def test_phone_key_ignores_active_company(self):
+        spain = self.env.ref('base.es')
+        france = self.env.ref('base.fr')
+        company = self.env['res.company'].create({'name': 'Taller Madrid', 'country_id': spain.id})
+        other = self.env['res.company'].create({'name': 'Taller París', 'country_id': france.id})
+        self.env.user.company_ids |= company | other
+        Partner = self.env['res.partner'].with_company(other)
+        partner = Partner.create({'name': 'Cliente Local', 'phone': '600 111 222', 'company_id': company.id})
+        self.assertEqual(partner.phone_key, '+34600111222')
+
+    def test_normalize_phone_key(self):
+        spain = self.env.ref('base.es')
+        italy = self.env.ref('base.it')
+        cases = [
+            ('+34 600 123 456', spain, '+34600123456'),
+            ('0034 600 123 456', spain, '+34600123456'),
+            ('600 123 456', spain, '+34600123456'),
+            ('34 600 123 456', spain, '+34600123456'),
+            ('06 1234 5678', italy, '+390612345678'),
+            ('+39 06 1234 5678', spain, '+390612345678'),
+            ('', spain, False),
+        ]
+        for number, country, key in cases:
+            with self.subTest(number=number, country=country.code):
+                self.assertEqual(normalize_phone_key(number, country), key)
+
+    def test_caller_card_lists_open_repairs(self):
+        orders = self._create_orders(2)
+        orders[1].action_cancel()
+        self.assertEqual(orders[0].partner_phone_key, '+34600123456')
+        card = self.env['res.partner']._get_caller_card('0034 600 123 456')
+        self.assertEqual([partner['id'] for partner in card['partners']], self.partner.ids)
+        self.assertEqual([repair['id'] for repair in card['open_repairs']], orders[0].ids)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import RepairCommon
+
+
+@tagged('post_install', '-at_install')
+class TestRepairReportDaily(RepairCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.Report = self.env['mobile.repair.report.daily']
+        self.orders = self._create_orders(3)
+        self.day = self.orders[0].date_received.date()
+        self._run_precommit()
+        self.Report._refresh(full=True)
+
+    def _run_precommit(self):
+        self.env.flush_all()
+        self.env.cr.precommit.run()
+
+    def _queued_days(self):
+        return set(self.env['mobile.repair.report.daily.queue'].search([]).mapped('date'))
+
+    def _day_rows(self, day=None):
+        return self.Report.search([('date', '=', day or self.day)])
+
+    def test_line_edit_queues_day_for_refresh(self):
+        amount_before = sum(self._day_rows().mapped('amount_total'))
+        self.orders[0].order_line[0].price_unit = 200.0
+        self._run_precommit()
+        self.assertEqual(self._queued_days(), {self.day})
+        self.assertAlmostEqual(sum(self._day_rows().mapped('amount_total')), amount_before,
+                               msg="La escritura de mostrador no reconstruye la tabla de hechos")
+        self.Report._refresh()
+        self.assertAlmostEqual(sum(self._day_rows().mapped('amount_total')), sum(self.orders.mapped('amount_total')))
+        self.assertFalse(self._queued_days())
+
+    def test_revalue_margins_refreshes_day(self):
+        self.service.standard_price = 25.0
+        self.env['mobile.repair.order']._revalue_margins([('id', 'in', self.orders.ids)])
+        self._run_precommit()
+        self.Report._refresh()
+        self.assertAlmostEqual(sum(self._day_rows().mapped('margin')), sum(self.orders.mapped('margin')))
+
+    def test_moved_and_deleted_orders_leave_their_day(self):
+        moved, deleted = self.orders[:2]
+        new_date = moved.date_received - timedelta(days=3)
+        moved.write({'date_received': new_date, 'date_promised': new_date + timedelta(days=1)})
+        deleted.action_cancel()
+        deleted.unlink()
+        self.Report._refresh()
+        self.assertEqual(sum(self._day_rows().mapped('order_count')), 1)
+        self.assertEqual(sum(self._day_rows(new_date.date()).mapped('order_count')), 1)
+
+    def test_average_repair_time_is_weighted_by_orders(self):
+        start = fields.Datetime.now() - timedelta(days=10)
+        for order, days, state in zip(self.orders, (2, 4, 6), ('repaired', 'repaired', 'delivered')):
+            order.write({'state': state, 'date_started': start, 'date_completed': start + timedelta(days=days)})
+        self.Report._refresh(full=True)
+        rows = self._day_rows()
+        self.assertEqual(sum(rows.mapped('repaired_count')), 3)
+        for fields_spec in (['repair_time_avg'], ['repair_time', 'repair_time_avg', 'repaired_count']):
+            [group] = self.Report.read_group([('id', 'in', rows.ids)], fields_spec, ['technician_id'])
+            self.assertAlmostEqual(group['repair_time_avg'], 4.0)
+            self.assertAlmostEqual(group['repair_time'], 12.0)
+
+
+@tagged('post_install', '-at_install')
+class TestRepairReportProblem(RepairCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.Report = self.env['mobile.repair.report.problem']
+        self.other_problem = self.env['mobile.repair.problem'].create({
+            'name': 'Batería', 'category_id': self.category.id,
+        })
+
+    def _run_precommit(self):
+        self.env.flush_all()
+        self.env.cr.precommit.run()
+
+    def test_rows_are_synced_once_before_commit(self):
+        order = self._create_orders(1)
+        order.write({'problem_ids': [(4, self.other_problem.id)]})
+        order.write({'state': 'in_repair'})
+        self.assertFalse(self.Report.search([('order_id', '=', order.id)]))
+        self._run_precommit()
+        rows = self.Report.search([('order_id', '=', order.id)])
+        self.assertEqual(rows.problem_id, self.problem | self.other_problem)
+        self.assertEqual(set(rows.mapped('state')), {'in_repair'})
+        self.assertAlmostEqual(sum(rows.mapped('amount')), order.amount_total)
+
+    def test_line_edit_resyncs_amount(self):
+        order = self._create_orders(1)
+        self._run_precommit()
+        order.order_line[0].price_unit = 200.0
+        self._run_precommit()
+        rows = self.Report.search([('order_id', '=', order.id)])
+        self.assertAlmostEqual(sum(rows.mapped('amount')), order.amount_total)